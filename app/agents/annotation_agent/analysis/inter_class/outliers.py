@@ -1,17 +1,25 @@
 from itertools import combinations
 
+import numpy as np
 import pandas as pd
+from scipy import sparse
 from shapely.geometry import box
 
+from agents.annotation_agent.analysis.inter_class.stats import iter_pairs_within_groups
+from agents.common.interpreter.outlier.outlier_interpreter import MAX_PREVIEW_ITEMS
 from agents.common.models.assets import AssetComparisonElement
 from agents.common.models.shapes import LabeledBox
 from agents.common.stats.outlier.base_outlier_stats import (
     BaseOutlierStats,
     ComparisonOutlierGroupItem,
+    ComparisonPairEntry,
 )
 
 
 class InterClassOutlierStats(BaseOutlierStats):
+    # Upper bound on the label pairs enumerated at once
+    MAX_PAIRS_PER_BLOCK = 2_000_000
+
     def __init__(
         self,
         df: pd.DataFrame,
@@ -29,7 +37,38 @@ class InterClassOutlierStats(BaseOutlierStats):
         self.overlap_threshold_ratio = overlap_threshold_ratio
 
     def _prepare_data(self) -> None:
-        pass
+        """
+        Index the boxes asset by asset (in asset id order) and build a sparse
+        asset × label presence matrix, used to find the assets of all label pairs
+        at once.
+        """
+        df = self.df.dropna(subset=["asset_id", "label"])
+        asset_codes, asset_ids = pd.factorize(df["asset_id"], sort=True)
+        label_codes, labels = pd.factorize(df["label"], sort=True)
+        self._asset_ids = asset_ids.tolist()
+        self._labels = labels.tolist()
+        self._label_index = {label: code for code, label in enumerate(self._labels)}
+
+        order = np.argsort(asset_codes, kind="stable")
+        boxes = df.iloc[order]
+        # Plain lists, elements are built box by box
+        self._boxes = list(
+            zip(
+                boxes[["x", "y", "w", "h"]].to_numpy(dtype=float).tolist(),
+                boxes["label_id"].tolist(),
+                strict=True,
+            )
+        )
+        self._box_labels = label_codes[order].tolist()
+        self._asset_bounds = np.concatenate(
+            ([0], np.cumsum(np.bincount(asset_codes, minlength=len(self._asset_ids))))
+        ).tolist()
+
+        self._presence = sparse.csr_matrix(
+            (np.ones(len(df), dtype=np.int32), (asset_codes, label_codes)),
+            shape=(len(self._asset_ids), len(self._labels)),
+        )
+        self._presence.sort_indices()
 
     def _compute_outliers(self) -> None:
         self.outlier_groups["unexpected_cooccurrence"] = {
@@ -51,50 +90,108 @@ class InterClassOutlierStats(BaseOutlierStats):
             label_id=row["label_id"],
         )
 
+    def _label_pairs(self, selected: pd.DataFrame) -> tuple[np.ndarray, np.ndarray]:
+        """Label codes of the pairs (a < b) selected by a label × label mask."""
+        names = np.asarray(selected.columns, dtype=object)
+        codes = np.array(
+            [self._label_index.get(name, -1) for name in names], dtype=np.intp
+        )
+        rows, columns = np.nonzero(
+            selected.reindex(index=selected.columns).to_numpy(dtype=bool)
+            & (names[:, None] < names[None, :])
+        )
+        first, second = codes[rows], codes[columns]
+        known = (first >= 0) & (second >= 0)
+        return first[known], second[known]
+
+    def _copresent_pairs(self, selected: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Find every asset where both labels of a pair selected in the label × label
+        mask appear. Pairs are enumerated from the sorted labels of each asset, so the
+        work grows with the label pairs present in the assets, not with the vocabulary.
+
+        Returns the pair keys (`first * num_labels + second`) and their asset, sorted
+        by pair then asset.
+        """
+        num_labels = len(self._labels)
+        labels = self._presence.indices
+        assets = np.repeat(
+            np.arange(self._presence.shape[0]), np.diff(self._presence.indptr)
+        )
+        key_blocks, asset_blocks = [], []
+        for first, second in iter_pairs_within_groups(
+            np.diff(self._presence.indptr), self.MAX_PAIRS_PER_BLOCK
+        ):
+            kept = selected[labels[first], labels[second]]
+            key_blocks.append(labels[first][kept] * num_labels + labels[second][kept])
+            asset_blocks.append(assets[first][kept])
+
+        keys = np.concatenate([np.empty(0, dtype=np.intp), *key_blocks])
+        key_assets = np.concatenate([np.empty(0, dtype=np.intp), *asset_blocks])
+        order = np.lexsort((key_assets, keys))
+        return keys[order], key_assets[order]
+
+    def _pair_entries(
+        self,
+        first: np.ndarray,
+        second: np.ndarray,
+        pair_assets: list[np.ndarray],
+    ) -> list[ComparisonPairEntry]:
+        """
+        One entry per pair, in the order of their first asset. Only the elements of
+        the first `MAX_PREVIEW_ITEMS` assets are built, since no more are rendered.
+        """
+        first, second = first.tolist(), second.tolist()
+        order = np.argsort([assets[0] for assets in pair_assets], kind="stable")
+        return [
+            {
+                "label_1": self._labels[first[i]],
+                "label_2": self._labels[second[i]],
+                "elements": [
+                    self._asset_element(asset, (first[i], second[i]))
+                    for asset in pair_assets[i][:MAX_PREVIEW_ITEMS].tolist()
+                ],
+            }
+            for i in order
+        ]
+
+    def _asset_element(
+        self, asset: int, label_codes: tuple[int, int]
+    ) -> AssetComparisonElement:
+        actual = []
+        for row in range(self._asset_bounds[asset], self._asset_bounds[asset + 1]):
+            if self._box_labels[row] in label_codes:
+                (x, y, w, h), label_id = self._boxes[row]
+                actual.append(LabeledBox(x=x, y=y, w=w, h=h, label_id=label_id))
+        return AssetComparisonElement(
+            id=str(self._asset_ids[asset]), actual=actual, expected=[]
+        )
+
     def _unexpected_cooccurrence(self) -> ComparisonOutlierGroupItem:
         total_images = self.df["asset_id"].nunique()
         min_count = max(2, total_images * self.co_threshold_low_ratio)
         min_number_of_assets = 3
 
-        rare_pairs = {
-            frozenset((a, b))
-            for a in self.co_matrix.columns
-            for b in self.co_matrix.columns
-            if a < b and self.co_matrix.at[a, b] <= min_count
-        }
+        rare_first, rare_second = self._label_pairs(self.co_matrix <= min_count)
+        num_labels = len(self._labels)
+        rare_pairs = np.zeros((num_labels, num_labels), dtype=bool)
+        rare_pairs[rare_first, rare_second] = True
 
-        pair_map: dict[tuple[str, str], list[AssetComparisonElement]] = {}
-
-        for asset_id, group in self.df.groupby("asset_id"):
-            labels = set(group["label"])
-            for pair in combinations(labels, 2):
-                key = frozenset(pair)
-                if key in rare_pairs:
-                    sorted_pair = tuple(sorted(pair))
-                    affected = group[group["label"].isin(pair)]
-                    element = AssetComparisonElement(
-                        id=str(asset_id),
-                        actual=[
-                            self._to_labeled_box(r) for _, r in affected.iterrows()
-                        ],
-                        expected=[],
-                    )
-                    pair_map.setdefault(sorted_pair, []).append(element)
-
-        filtered_pairs = {
-            (label_1, label_2): elements
-            for (label_1, label_2), elements in pair_map.items()
-            if len(elements) >= min_number_of_assets
-        }
+        keys, assets = self._copresent_pairs(rare_pairs)
+        keys, starts, counts = np.unique(keys, return_index=True, return_counts=True)
+        kept = counts >= min_number_of_assets
+        pair_assets = [
+            assets[start : start + count]
+            for start, count in zip(starts[kept], counts[kept], strict=True)
+        ]
 
         return {
             "description": (
                 "Pairs of labels that rarely appear together in the dataset"
             ),
-            "pairs": [
-                {"label_1": l1, "label_2": l2, "elements": elems}
-                for (l1, l2), elems in filtered_pairs.items()
-            ],
+            "pairs": self._pair_entries(
+                keys[kept] // num_labels, keys[kept] % num_labels, pair_assets
+            ),
         }
 
     def _missing_expected_cooccurrence(self) -> ComparisonOutlierGroupItem:
@@ -102,48 +199,37 @@ class InterClassOutlierStats(BaseOutlierStats):
         min_expected = max(3, total_images * self.co_threshold_ratio)
         min_number_of_assets = 3
 
-        expected_pairs = {
-            frozenset((a, b))
-            for a in self.co_matrix.columns
-            for b in self.co_matrix.columns
-            if a < b and self.co_matrix.at[a, b] >= min_expected
-        }
-
-        pair_map: dict[tuple[str, str], list[AssetComparisonElement]] = {}
-
-        for asset_id, group in self.df.groupby("asset_id"):
-            labels = set(group["label"])
-            for pair in expected_pairs:
-                if len(pair & labels) == 1:
-                    sorted_pair = tuple(sorted(pair))
-                    affected = group[group["label"].isin(pair)]
-                    element = AssetComparisonElement(
-                        id=str(asset_id),
-                        actual=[
-                            self._to_labeled_box(r) for _, r in affected.iterrows()
-                        ],
-                        expected=[],
-                    )
-                    pair_map.setdefault(sorted_pair, []).append(element)
-
-        filtered_pairs = {
-            (label_1, label_2): elements
-            for (label_1, label_2), elements in pair_map.items()
-            if len(elements) >= min_number_of_assets
-        }
+        expected_first, expected_second = self._label_pairs(
+            self.co_matrix >= min_expected
+        )
+        # Expected pairs each co-occur in a sizeable share of the assets, so they are
+        # few and can be compared one by one
+        label_assets = self._presence.tocsc()
+        label_assets.sort_indices()
+        kept, pair_assets = [], []
+        for i, (first, second) in enumerate(
+            zip(expected_first, expected_second, strict=True)
+        ):
+            assets = np.setxor1d(
+                label_assets.indices[
+                    label_assets.indptr[first] : label_assets.indptr[first + 1]
+                ],
+                label_assets.indices[
+                    label_assets.indptr[second] : label_assets.indptr[second + 1]
+                ],
+                assume_unique=True,
+            )
+            if len(assets) >= min_number_of_assets:
+                kept.append(i)
+                pair_assets.append(assets)
 
         return {
             "description": (
                 "Pairs of labels that usually appear together, but are missing in certain images"
             ),
-            "pairs": [
-                {
-                    "label_1": label_1,
-                    "label_2": label_2,
-                    "elements": elements,
-                }
-                for (label_1, label_2), elements in filtered_pairs.items()
-            ],
+            "pairs": self._pair_entries(
+                expected_first[kept], expected_second[kept], pair_assets
+            ),
         }
 
     def _unexpected_overlap(self) -> ComparisonOutlierGroupItem:
@@ -1,13 +1,18 @@
+from collections.abc import Iterator
 from typing import Any
 
+import numpy as np
 import pandas as pd
-from shapely.geometry import box
+from scipy import sparse
 
 from agents.common.charts.types import BarChart, ChartType
 from agents.common.stats.analysis.base_chart_stats import BaseChartStats
 
 
 class InterClassStats(BaseChartStats["InterClassStats"]):
+    # Upper bound on the box pairs scored at once, dense scenes have k² / 2 pairs
+    MAX_PAIRS_PER_BLOCK = 2_000_000
+
     def __init__(
         self,
         df: pd.DataFrame,
@@ -30,79 +35,129 @@ class InterClassStats(BaseChartStats["InterClassStats"]):
 
     def _compute_stats(self):
         self._compute_cooccurrence()
-        self._compute_mean_iou_per_class_pair()
-        self._compute_overlap_count_matrix()
+        labels, iou_sum, iou_count, overlap_count = self._compute_pairwise_overlaps()
+        self._compute_mean_iou_per_class_pair(labels, iou_sum, iou_count)
+        self._compute_overlap_count_matrix(labels, overlap_count)
         self._compute_summary_stats()
 
-    def _group_boxes_by_asset(self):
-        for asset_id, group in self.df.groupby("asset_id"):
-            boxes = []
-            for _, row in group.iterrows():
-                try:
-                    geom = box(
-                        row["x"], row["y"], row["x"] + row["w"], row["y"] + row["h"]
-                    )
-                    boxes.append((row["label"], geom))
-                except KeyError:
-                    continue
-            yield asset_id, boxes
+    def _compute_pairwise_overlaps(self):
+        """
+        Score every pair of boxes of the same asset in a single vectorized pass.
+
+        Boxes are laid out asset by asset and their pairs are scored by blocks of at
+        most `MAX_PAIRS_PER_BLOCK`, then accumulated per (sorted) label pair into the
+        sum and number of IoUs above `iou_threshold_mean` and the number of IoUs above
+        `iou_threshold_count`.
+        """
+        df = self.df.dropna(subset=["asset_id", "label"])
+        assets = df.groupby("asset_id", sort=False).ngroup().to_numpy()
+        order = np.argsort(assets, kind="stable")
+        df = df.iloc[order]
+        label_codes, labels = pd.factorize(df["label"], sort=True)
+        num_labels = len(labels)
+
+        x = df["x"].to_numpy(dtype=float)
+        y = df["y"].to_numpy(dtype=float)
+        w = df["w"].to_numpy(dtype=float)
+        h = df["h"].to_numpy(dtype=float)
+        x_min, x_max = np.minimum(x, x + w), np.maximum(x, x + w)
+        y_min, y_max = np.minimum(y, y + h), np.maximum(y, y + h)
+        areas = (x_max - x_min) * (y_max - y_min)
+
+        iou_sum = np.zeros(num_labels * num_labels)
+        iou_count = np.zeros(num_labels * num_labels, dtype=np.int64)
+        overlap_count = np.zeros(num_labels * num_labels, dtype=np.int64)
+
+        for first, second in iter_pairs_within_groups(
+            np.bincount(assets[order]), self.MAX_PAIRS_PER_BLOCK
+        ):
+            inter_w = np.minimum(x_max[first], x_max[second]) - np.maximum(
+                x_min[first], x_min[second]
+            )
+            inter_h = np.minimum(y_max[first], y_max[second]) - np.maximum(
+                y_min[first], y_min[second]
+            )
+            intersection = np.clip(inter_w, 0, None) * np.clip(inter_h, 0, None)
+            union = areas[first] + areas[second] - intersection
+            ious = np.divide(
+                intersection,
+                union,
+                out=np.zeros_like(intersection),
+                where=union != 0,
+            )
+
+            pairs = np.minimum(
+                label_codes[first], label_codes[second]
+            ) * num_labels + np.maximum(label_codes[first], label_codes[second])
+            kept = ious >= self.iou_threshold_mean
+            iou_sum += np.bincount(
+                pairs[kept], weights=ious[kept], minlength=len(iou_sum)
+            )
+            iou_count += np.bincount(pairs[kept], minlength=len(iou_count))
+            overlapping = ious >= self.iou_threshold_count
+            overlap_count += np.bincount(
+                pairs[overlapping], minlength=len(overlap_count)
+            )
+
+        shape = (num_labels, num_labels)
+        return (
+            list(labels),
+            iou_sum.reshape(shape),
+            iou_count.reshape(shape),
+            overlap_count.reshape(shape),
+        )
 
     def _compute_cooccurrence(self):
-        cooccurrence = (
-            self.df.groupby(["asset_id", "label"])
-            .size()
-            .unstack(fill_value=0)
-            .astype(bool)
-            .astype(int)
+        """
+        Count the assets in which each pair of labels appears, from a sparse one-hot
+        asset × label matrix, so memory grows with the number of annotations rather
+        than with assets × labels.
+        """
+        df = self.df.dropna(subset=["asset_id", "label"])
+        asset_codes, _ = pd.factorize(df["asset_id"])
+        label_codes, labels = pd.factorize(df["label"], sort=True)
+        presence = sparse.csr_matrix(
+            (np.ones(len(df), dtype=np.int64), (asset_codes, label_codes)),
+            shape=(asset_codes.max(initial=-1) + 1, len(labels)),
         )
-        matrix = cooccurrence.T @ cooccurrence
-        self.stats["cooccurrence_matrix"] = matrix
-        self.stats["cooccurrence_dict"] = matrix.to_dict()
-
-    def _compute_mean_iou_per_class_pair(self):
-        from collections import defaultdict
-        from itertools import combinations
-
-        pairwise_ious: defaultdict[tuple[str, str], list[float]] = defaultdict(list)
-
-        for _, boxes in self._group_boxes_by_asset():
-            for (label_a, box_a), (label_b, box_b) in combinations(boxes, 2):
-                iou = box_a.intersection(box_b).area / box_a.union(box_b).area
-                if iou >= self.iou_threshold_mean:
-                    pair = tuple(sorted((label_a, label_b)))
-                    pairwise_ious[pair].append(iou)
+        # Several boxes of a label in the same asset count once
+        presence.data[:] = 1
+        counts = (presence.T @ presence).tocoo()
 
-        iou_matrix: defaultdict[str, defaultdict[str, float]] = defaultdict(
-            lambda: defaultdict(float)
+        matrix = pd.DataFrame(
+            counts.toarray(), index=pd.Index(labels, name="label"), columns=labels
+        )
+        matrix.columns.name = "label"
+        self.stats["cooccurrence_matrix"] = matrix
+        # Only the pairs of labels that appear together
+        names = labels.tolist()
+        cooccurrence_dict: dict[Any, dict[Any, int]] = {}
+        for row, column, count in zip(
+            counts.row.tolist(), counts.col.tolist(), counts.data.tolist(), strict=True
+        ):
+            cooccurrence_dict.setdefault(names[column], {})[names[row]] = count
+        self.stats["cooccurrence_dict"] = cooccurrence_dict
+
+    def _compute_mean_iou_per_class_pair(self, labels, iou_sum, iou_count):
+        iou_sum = _symmetrize(iou_sum)
+        iou_count = _symmetrize(iou_count)
+        mean_iou = np.divide(
+            iou_sum, iou_count, out=np.zeros_like(iou_sum), where=iou_count > 0
+        )
+        # Only the labels that are part of at least one pair
+        paired = np.flatnonzero(iou_count.any(axis=1))
+        matrix_df = pd.DataFrame(
+            mean_iou[np.ix_(paired, paired)],
+            index=[labels[i] for i in paired],
+            columns=[labels[i] for i in paired],
         )
-        for (label_a, label_b), values in pairwise_ious.items():
-            mean_iou = sum(values) / len(values)
-            iou_matrix[label_a][label_b] = mean_iou
-            iou_matrix[label_b][label_a] = mean_iou
-
-        matrix_df = pd.DataFrame(iou_matrix).fillna(0.0)
         self.stats["mean_iou_per_pair_matrix"] = matrix_df
         self.stats["iou_threshold_mean"] = self.iou_threshold_mean
 
-    def _compute_overlap_count_matrix(self):
-        from collections import defaultdict
-        from itertools import combinations
-
-        overlap_counts: defaultdict[tuple[str, str], int] = defaultdict(int)
-        for _, boxes in self._group_boxes_by_asset():
-            for (label_a, box_a), (label_b, box_b) in combinations(boxes, 2):
-                iou = box_a.intersection(box_b).area / box_a.union(box_b).area
-                if iou >= self.iou_threshold_count:
-                    pair = tuple(sorted((label_a, label_b)))
-                    overlap_counts[pair] += 1
-
-        labels = sorted(set(self.df["label"]))
-        count_matrix = pd.DataFrame(0, index=labels, columns=labels)
-
-        for (label_a, label_b), count in overlap_counts.items():
-            count_matrix.loc[label_a, label_b] = count
-            count_matrix.loc[label_b, label_a] = count
-
+    def _compute_overlap_count_matrix(self, labels, overlap_count):
+        count_matrix = pd.DataFrame(
+            _symmetrize(overlap_count), index=labels, columns=labels
+        )
         self.stats["overlap_count_matrix"] = count_matrix
         self.stats["iou_threshold_count"] = self.iou_threshold_count
 
@@ -115,16 +170,11 @@ class InterClassStats(BaseChartStats["InterClassStats"]):
         self, matrix: pd.DataFrame, top_n: int = 10
     ) -> list[tuple[str, str, int]]:
         labels = matrix.index.tolist()
-        result = []
-
-        for i in range(len(labels)):
-            for j in range(i, len(labels)):
-                a, b = labels[i], labels[j]
-                value = matrix.at[a, b]
-                result.append((a, b, int(value)))
-
-        result.sort(key=lambda x: x[2], reverse=True)
-        return result[:top_n]
+        rows, columns = np.triu_indices(len(labels))
+        values = matrix.to_numpy()[rows, columns]
+        # Stable, so that ties keep the row-major order of the upper triangle
+        top = np.argsort(-values, kind="stable")[:top_n]
+        return [(labels[rows[i]], labels[columns[i]], int(values[i])) for i in top]
 
     def _compute_top_cooccurrences(self, top_n: int = 10):
         matrix = self.stats["cooccurrence_matrix"]
@@ -191,3 +241,35 @@ class InterClassStats(BaseChartStats["InterClassStats"]):
             xlabel="Class",
             ylabel="Co-occurrence Count",
         )
+
+
+def iter_pairs_within_groups(
+    group_sizes: np.ndarray, max_pairs: int
+) -> Iterator[tuple[np.ndarray, np.ndarray]]:
+    """
+    Enumerate the pairs of positions (i, j), i < j, of items laid out group after
+    group that belong to the same group. The pairs of item `i` are the items that
+    follow it up to the end of its group, and they are yielded by blocks of at most
+    `max_pairs` (more when a single item has more partners).
+    """
+    group_ends = np.repeat(np.cumsum(group_sizes), group_sizes)
+    partners = group_ends - np.arange(len(group_ends)) - 1
+    cumulative_pairs = np.concatenate(([0], np.cumsum(partners)))
+    start = 0
+    while start < len(partners):
+        stop = np.searchsorted(
+            cumulative_pairs, cumulative_pairs[start] + max_pairs, side="right"
+        )
+        stop = min(max(stop - 1, start + 1), len(partners))
+        block_partners = partners[start:stop]
+        first = np.repeat(np.arange(start, stop), block_partners)
+        run_starts = np.repeat(
+            cumulative_pairs[start:stop] - cumulative_pairs[start], block_partners
+        )
+        yield first, first + 1 + np.arange(len(first)) - run_starts
+        start = stop
+
+
+def _symmetrize(upper: np.ndarray) -> np.ndarray:
+    """Mirror a matrix only filled on and above its diagonal."""
+    return upper + np.triu(upper, 1).T
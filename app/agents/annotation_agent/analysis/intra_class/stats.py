@@ -3,6 +3,7 @@ from typing import Any
 import numpy as np
 import pandas as pd
 
+from agents.common.embedding_store import stack_embeddings
 from agents.common.stats.analysis.base_chart_stats import BaseChartStats
 
 
@@ -19,11 +20,11 @@ class IntraClassEmbeddingCentroidStats(
         self.embedding_col = embedding_col
         self.label_col = label_col
         self.stats: dict[str, Any] = {}
+        self.embeddings = np.empty((0, 0), dtype=np.float32)
 
     def _prepare_data(self):
-        self.df[self.embedding_col] = self.df[self.embedding_col].apply(
-            lambda x: np.array(x) if isinstance(x, list) else x
-        )
+        self.embeddings, has_embeddings = stack_embeddings(self.df[self.embedding_col])
+        self.df = self.df[has_embeddings]
 
     def _generate_all_chart_groups(self) -> None:
         pass
@@ -36,22 +37,23 @@ class IntraClassEmbeddingCentroidStats(
         label_centroids: dict[str, np.ndarray] = {}
         shape_distances: list[dict[str, Any]] = []
 
-        for label, group in self.df.groupby(self.label_col):
-            embeddings = np.stack(group[self.embedding_col].values)
+        shape_ids = self.df["shape_id"].to_numpy()
+        for label, rows in self.df.groupby(self.label_col).indices.items():
+            embeddings = self.embeddings[rows]
             centroid = embeddings.mean(axis=0)
             label_centroids[label] = centroid
 
             distances = np.linalg.norm(embeddings - centroid, axis=1)
 
-            for i, (_, row) in enumerate(group.iterrows()):
+            for shape_id, distance in zip(shape_ids[rows], distances, strict=True):
                 shape_distances.append(
                     {
-                        "shape_id": row["shape_id"],
+                        "shape_id": shape_id,
                         "label": label,
-                        "distance_to_centroid": distances[i],
+                        "distance_to_centroid": distance,
                     }
                 )
-                all_distances.append(distances[i])
+                all_distances.append(distance)
 
         self.stats["shape_distances"] = pd.DataFrame(shape_distances)
         self.stats["label_centroids"] = label_centroids
@@ -1,9 +1,6 @@
-import ast
-
 import numpy as np
 import pandas as pd
 import picsellia
-from sklearn.metrics.pairwise import cosine_similarity
 
 from agents.annotation_agent.models.annotations import (
     Annotation,
@@ -11,11 +8,15 @@ from agents.annotation_agent.models.annotations import (
     Shape,
     ShapeIssueType,
 )
-from agents.common.ai_models.clip_model import CLIPModelHandler
+from agents.common.ai_models.registry import get_clip_model
+from agents.common.embedding_store import parse_embedding, stack_embeddings
 from agents.common.stats.analysis.base_stats import BaseStats
 
 
 class ShapeMislabeledStats(BaseStats["ShapeMislabeledStats"]):
+    # Shapes compared to the labels at once, bounds the size of the similarity block
+    SIMILARITY_CHUNK_SIZE = 8192
+
     def __init__(
         self, df: pd.DataFrame, labels: list[picsellia.Label], threshold: float = 0.01
     ):
@@ -23,10 +24,8 @@ class ShapeMislabeledStats(BaseStats["ShapeMislabeledStats"]):
 
         self.threshold = threshold
 
-        self.df["shape_embeddings"] = self.df["shape_embeddings"].apply(
-            lambda x: ast.literal_eval(x) if isinstance(x, str) else x
-        )
-        self.clip_handler = CLIPModelHandler()
+        self.df["shape_embeddings"] = self.df["shape_embeddings"].apply(parse_embedding)
+        self.clip_handler = get_clip_model()
         self.clip_embedded_labels = self.clip_handler.compute_text_embeddings(
             [label.name for label in labels]
         )
@@ -43,333 +42,154 @@ class ShapeMislabeledStats(BaseStats["ShapeMislabeledStats"]):
     def _find_wrongly_annotated_shapes(
         self,
     ) -> tuple[list[Image], list[Image]]:
-        wrongly_annotated_for_sure = []
-        ambiguous_annotations = []
-        correct_shapes = 0
-        for _, row in self.df.iterrows():
-            image_embedding = row["shape_embeddings"]
-            label_annotated = str(row["label"])
-            annotation_id = str(row["annotation_id"])
-            if image_embedding:
-                status, top_labels, _ = self._evaluate_label_quality(
-                    shape_embedding=image_embedding,
-                    annotated_label=label_annotated,
-                    label_embeddings=self.clip_embedded_labels,
-                )
-                if status == "ambiguous":
-                    ambiguous_annotations.append(
-                        Image(
-                            asset_id=str(row["asset_id"]),
-                            annotation=Annotation(
-                                id=annotation_id,
-                                shapes=[
-                                    Shape(
-                                        id=str(row["shape_id"]),
-                                        x=row["x"],
-                                        y=row["y"],
-                                        w=row["w"],
-                                        h=row["h"],
-                                        issue=ShapeIssueType.AMBIGIOUS_CLASS,
-                                        label_annotated=str(
-                                            self.picsellia_labels_map[label_annotated]
-                                        ),
-                                        label_suggested=str(
-                                            self.picsellia_labels_map[top_labels[0][0]]
-                                        ),
-                                    )
-                                ],
-                            ),
-                        )
-                    )
-                elif status == "wrong":
-                    wrongly_annotated_for_sure.append(
-                        Image(
-                            asset_id=str(row["asset_id"]),
-                            annotation=Annotation(
-                                id=annotation_id,
-                                shapes=[
-                                    Shape(
-                                        id=str(row["shape_id"]),
-                                        x=row["x"],
-                                        y=row["y"],
-                                        w=row["w"],
-                                        h=row["h"],
-                                        issue=ShapeIssueType.WRONG_CLASS,
-                                        label_annotated=str(
-                                            self.picsellia_labels_map[label_annotated]
-                                        ),
-                                        label_suggested=str(
-                                            self.picsellia_labels_map[top_labels[0][0]]
-                                        ),
-                                    )
-                                ],
-                            ),
-                        )
-                    )
-                elif status == "correct":
-                    correct_shapes += 1
+        embeddings, mask = stack_embeddings(self.df["shape_embeddings"])
+        rows = self.df[mask]
+        label_names = list(self.clip_embedded_labels)
+        ambiguous, wrong, top_labels = self._evaluate_labels_quality(
+            shape_embeddings=embeddings,
+            annotated_labels=rows["label"].astype(str).tolist(),
+            label_names=label_names,
+        )
 
+        ambiguous_annotations = [
+            self._build_image(row, ShapeIssueType.AMBIGIOUS_CLASS, label_names[top])
+            for row, top in zip(
+                rows[ambiguous].to_dict("records"), top_labels[ambiguous], strict=True
+            )
+        ]
+        wrongly_annotated_for_sure = [
+            self._build_image(row, ShapeIssueType.WRONG_CLASS, label_names[top])
+            for row, top in zip(
+                rows[wrong].to_dict("records"), top_labels[wrong], strict=True
+            )
+        ]
         return ambiguous_annotations, wrongly_annotated_for_sure
 
-    def _evaluate_label_quality(
+    def _build_image(
+        self, row: dict, issue: ShapeIssueType, suggested_label: str
+    ) -> Image:
+        label_annotated = str(row["label"])
+        return Image(
+            asset_id=str(row["asset_id"]),
+            annotation=Annotation(
+                id=str(row["annotation_id"]),
+                shapes=[
+                    Shape(
+                        id=str(row["shape_id"]),
+                        x=row["x"],
+                        y=row["y"],
+                        w=row["w"],
+                        h=row["h"],
+                        issue=issue,
+                        label_annotated=str(self.picsellia_labels_map[label_annotated]),
+                        label_suggested=str(self.picsellia_labels_map[suggested_label]),
+                    )
+                ],
+            ),
+        )
+
+    def _evaluate_labels_quality(
         self,
-        shape_embedding,
-        annotated_label,
-        label_embeddings,
-        min_confidence=0.5,
-        rank_tolerance=1,  # Maximum acceptable rank for small datasets
-        verbose=False,
-    ) -> tuple[str, list[tuple[str, float]], int | None]:
+        shape_embeddings: np.ndarray,
+        annotated_labels: list[str],
+        label_names: list[str],
+        min_confidence: float = 0.5,
+        rank_tolerance: int = 1,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
         """
-        Simplified version to handle datasets with fewer classes.
-        For datasets with < 10 classes, returns only 'correct' or 'wrong'.
-
-        Parameters:
-            shape_embedding: vector representation of shape
-            annotated_label: label assigned by annotator
-            label_embeddings: dict of {label: embedding_vector}
-            min_confidence: float → minimum similarity of top match to call something 'wrong'
-            verbose: bool → whether to print detailed information
+        Evaluate the annotated label of every shape against its CLIP similarity to the
+        label names (see `_classify_similarities`). Shapes are compared to the labels by
+        blocks of `SIMILARITY_CHUNK_SIZE` rows of the shapes × labels cosine similarity
+        matrix.
 
         Returns:
-            status: 'correct' | 'wrong'
-            top_labels: list of (label, similarity)
-            annotated_label_rank: int
+            ambiguous: boolean mask of the shapes with an ambiguous label
+            wrong: boolean mask of the shapes with a wrong label
+            top_labels: index in `label_names` of the most similar label of each shape
         """
-
-        shape_vec = np.array(shape_embedding).reshape(1, -1)
-        label_names = list(label_embeddings.keys())
-        label_vecs = np.array([label_embeddings[label] for label in label_names])
-        num_labels = len(label_names)
-
-        # Determine if we should use simplified logic based on class count
-        use_simplified = num_labels < 10
-
-        # Always check at least top 2 labels, but cap at 5% for larger datasets
-        top_n = self._determine_top_n(num_labels)
-
-        similarities, sorted_labels = self._compute_similarities(
-            shape_vec, label_vecs, label_names
-        )
-
-        top_labels = sorted_labels[:top_n]
-        annotated_label_rank = self._get_annotated_label_rank(
-            sorted_labels, annotated_label
+        num_shapes = len(annotated_labels)
+        ambiguous = np.zeros(num_shapes, dtype=bool)
+        wrong = np.zeros(num_shapes, dtype=bool)
+        top_labels = np.zeros(num_shapes, dtype=np.intp)
+        if num_shapes == 0 or not label_names:
+            return ambiguous, wrong, top_labels
+
+        label_vecs = _normalize_rows(
+            np.array([self.clip_embedded_labels[label] for label in label_names])
         )
-        top_label, top_sim = sorted_labels[0]
-        annotated_sim = self._get_annotated_similarity(
-            annotated_label, label_names, similarities
+        label_index = {label: i for i, label in enumerate(label_names)}
+        annotated = np.array(
+            [label_index.get(label, -1) for label in annotated_labels], dtype=np.intp
         )
 
-        # If annotated label not in embeddings, always wrong
-        if annotated_label_rank is None:
-            return self._handle_missing_annotated_label(verbose, top_labels)
-
-        # If top match, correct
-        if annotated_label_rank == 0:
-            return self._handle_correct_label(verbose, top_labels)
-
-        # For simplified case (< 10 classes): More strict evaluation for non-top matches
-        if use_simplified:
-            return self._handle_simplified_case(
-                annotated_label_rank=annotated_label_rank,
-                top_sim=top_sim,
-                annotated_sim=annotated_sim,
-                top_labels=top_labels,
-                min_confidence=min_confidence,
-                rank_tolerance=rank_tolerance,
-                verbose=verbose,
+        for start in range(0, num_shapes, self.SIMILARITY_CHUNK_SIZE):
+            chunk = slice(start, start + self.SIMILARITY_CHUNK_SIZE)
+            similarities = (
+                _normalize_rows(shape_embeddings[chunk].astype(np.float64))
+                @ label_vecs.T
             )
-
-        # For datasets with >= 10 classes: Use original logic
-        # If not in top-N, check if it's wrong or ambiguous
-        return self._handle_full_case(
-            annotated_label_rank=annotated_label_rank,
-            top_n=top_n,
-            annotated_label=annotated_label,
-            top_sim=top_sim,
-            annotated_sim=annotated_sim,
-            top_labels=top_labels,
-            top_label=top_label,
-            min_confidence=min_confidence,
-            verbose=verbose,
-        )
-
-    def _determine_top_n(self, num_labels: int) -> int:
-        """Determine how many top labels to consider based on dataset size."""
-        return max(2, int(0.05 * num_labels))
-
-    def _compute_similarities(
-        self, shape_vec, label_vecs, label_names
-    ) -> tuple[np.ndarray, list[tuple[str, float]]]:
-        """Compute cosine similarities and sort labels by similarity."""
-        similarities = cosine_similarity(shape_vec, label_vecs)[0]
-        sorted_indices = similarities.argsort()[::-1]
-        sorted_labels = [(label_names[i], similarities[i]) for i in sorted_indices]
-        return similarities, sorted_labels
-
-    def _get_annotated_label_rank(self, sorted_labels, annotated_label) -> int | None:
-        """Find the rank of the annotated label in the sorted labels."""
-        return next(
-            (
-                i
-                for i, (label, _) in enumerate(sorted_labels)
-                if label == annotated_label
-            ),
-            None,
-        )
-
-    def _get_annotated_similarity(
-        self, annotated_label, label_names, similarities
-    ) -> float | None:
-        """Get the similarity of the annotated label with the top label."""
-        if annotated_label in label_names:
-            return similarities[label_names.index(annotated_label)]
-        return None
-
-    def _handle_missing_annotated_label(
-        self, verbose, top_labels
-    ) -> tuple[str, list[tuple[str, float]], int | None]:
-        """Handle the case where the annotated label is not in the embeddings."""
-        if verbose:
-            print("❌ Annotated label not in label embeddings.")
-        return "wrong", top_labels, None
-
-    def _handle_correct_label(
-        self, verbose, top_labels
-    ) -> tuple[str, list[tuple[str, float]], int | None]:
-        """Handle the case where the top label matches the annotated label."""
-        if verbose:
-            print("✅ Result: CORRECT (top-1 match)")
-        return "correct", top_labels, 0
-
-    def _handle_simplified_case(
-        self,
-        annotated_label_rank,
-        top_sim,
-        annotated_sim,
-        top_labels,
-        min_confidence,
-        rank_tolerance,
-        verbose,
-    ) -> tuple[str, list[tuple[str, float]], int | None]:
-        """Handle the simplified case where there are fewer than 10 classes."""
-        if annotated_label_rank > rank_tolerance:
-            if verbose:
-                print(
-                    f"🚩 Result: WRONG (rank {annotated_label_rank + 1} exceeds max tolerated rank {rank_tolerance + 1})"
-                )
-            return "wrong", top_labels, annotated_label_rank
-
-        if annotated_sim < min_confidence:
-            if verbose:
-                print(
-                    f"🚩 Result: WRONG (similarity {annotated_sim:.4f} below min confidence {min_confidence:.4f})"
-                )
-            return "wrong", top_labels, annotated_label_rank
-
-        strict_threshold = self.threshold / 2
-        if (top_sim - annotated_sim) > strict_threshold:
-            if verbose:
-                print(
-                    f"🚩 Result: WRONG (gap {top_sim - annotated_sim:.4f} > strict threshold {strict_threshold:.4f})"
-                )
-            return "wrong", top_labels, annotated_label_rank
-        else:
-            if verbose:
-                print(
-                    "✅ Result: CORRECT (within rank tolerance with small similarity gap)"
+            ambiguous[chunk], wrong[chunk], top_labels[chunk] = (
+                self._classify_similarities(
+                    similarities, annotated[chunk], min_confidence, rank_tolerance
                 )
-            return "correct", top_labels, annotated_label_rank
-
-    def _handle_full_case(
-        self,
-        annotated_label_rank,
-        top_n,
-        annotated_label,
-        top_sim,
-        annotated_sim,
-        top_labels,
-        top_label,
-        min_confidence,
-        verbose,
-    ) -> tuple[str, list[tuple[str, float]], int | None]:
-        """Handle the full case where there are 10 or more classes."""
-        if annotated_label_rank >= top_n:
-            return self._handle_non_top_prediction(
-                annotated_label=annotated_label,
-                top_labels=top_labels,
-                annotated_sim=annotated_sim,
-                top_sim=top_sim,
-                top_label=top_label,
-                min_confidence=min_confidence,
-                verbose=verbose,
             )
+        return ambiguous, wrong, top_labels
 
-        return self._handle_top_prediction(
-            annotated_label_rank=annotated_label_rank,
-            top_labels=top_labels,
-            verbose=verbose,
-        )
-
-    def _handle_non_top_prediction(
+    def _classify_similarities(
         self,
-        annotated_label,
-        top_labels,
-        annotated_sim,
-        top_sim,
-        top_label,
-        min_confidence,
-        verbose,
-    ) -> tuple[str, list[tuple[str, float]], int | None]:
-        """Handles the case where the annotated label is not in the top N predictions."""
-        if verbose:
-            self._print_prediction_details(
-                annotated_label, top_labels, annotated_sim, top_sim, top_label
-            )
-
-        if top_sim >= min_confidence and (top_sim - annotated_sim) > self.threshold:
-            if verbose:
-                print(
-                    f"🚩 Result: WRONG (not in top-{len(top_labels)} and confidence gap {top_sim - annotated_sim:.4f} > {self.threshold})"
-                )
-            return "wrong", top_labels, None
-
-        if verbose:
-            print(
-                f"⚠️ Result: AMBIGUOUS (not in top-{len(top_labels)} but similarity gap is small)"
+        similarities: np.ndarray,
+        annotated: np.ndarray,
+        min_confidence: float,
+        rank_tolerance: int,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Classify a block of shapes from their similarities to the labels:
+        - an annotated label without embedding is wrong, the most similar one is right;
+        - with fewer than 10 labels, another label is wrong when it ranks beyond
+          `rank_tolerance`, is less similar than `min_confidence` or trails the top
+          label by more than half the threshold;
+        - otherwise, a label outside the `_determine_top_n` most similar ones is wrong
+          when the top label is confident and leads by more than the threshold, and
+          ambiguous if not; a label inside them is ambiguous when their similarities
+          are within the threshold.
+        """
+        rows = np.arange(len(similarities))
+        num_labels = similarities.shape[1]
+        known = annotated >= 0
+        annotated_sim = similarities[rows, np.where(known, annotated, 0)]
+        # Number of labels strictly more similar than the annotated one
+        rank = (similarities > annotated_sim[:, None]).sum(axis=1)
+        top_labels = similarities.argmax(axis=1)
+        top_sim = similarities[rows, top_labels]
+        gap = top_sim - annotated_sim
+
+        if num_labels < 10:
+            wrong = (rank > 0) & (
+                (rank > rank_tolerance)
+                | (annotated_sim < min_confidence)
+                | (gap > self.threshold / 2)
             )
-        return "ambiguous", top_labels, None
-
-    def _handle_top_prediction(
-        self,
-        annotated_label_rank,
-        top_labels,
-        verbose,
-    ) -> tuple[str, list[tuple[str, float]], int | None]:
-        """Handles the case where the annotated label is in the top N predictions."""
-        if verbose:
-            print(f"✅ Result: CORRECT (top-{annotated_label_rank + 1} match)")
+            ambiguous = np.zeros(len(similarities), dtype=bool)
+        else:
+            top_n = self._determine_top_n(num_labels)
+            outside_top = rank >= top_n
+            wrong = outside_top & (top_sim >= min_confidence) & (gap > self.threshold)
+            # Similarity of the top_n-th label, the lowest of the top labels
+            lowest_top_sim = np.partition(similarities, num_labels - top_n, axis=1)[
+                :, num_labels - top_n
+            ]
+            clustered = (top_sim - lowest_top_sim) < self.threshold
+            ambiguous = (outside_top & ~wrong) | ((rank > 0) & ~outside_top & clustered)
 
-        sim_vals = [sim for _, sim in top_labels]
-        sim_range = max(sim_vals) - min(sim_vals)
-        is_clustered = sim_range < self.threshold
+        # If annotated label not in embeddings, always wrong
+        return ambiguous & known, wrong | ~known, top_labels
 
-        if is_clustered:
-            if verbose:
-                print("⚠️ Result: AMBIGUOUS (similarity values clustered)")
-            return "ambiguous", top_labels, annotated_label_rank
+    def _determine_top_n(self, num_labels: int) -> int:
+        """Determine how many top labels to consider based on dataset size."""
+        return max(2, int(0.05 * num_labels))
 
-        return "correct", top_labels, annotated_label_rank
 
-    def _print_prediction_details(
-        self, annotated_label, top_labels, annotated_sim, top_sim, top_label
-    ):
-        """Prints details about the prediction for debugging purposes."""
-        print(f"\n🔎 Annotated Label: {annotated_label}")
-        print(f"📦 Top {len(top_labels)} Predicted Labels:")
-        for i, (label, sim) in enumerate(top_labels):
-            print(f"  {i + 1}. {label:20s} | Similarity: {sim:.4f}")
-        if annotated_sim is not None:
-            print(f"🧭 Annotated label similarity: {annotated_sim:.4f}")
-        print(f"🏅 Top prediction: {top_label} ({top_sim:.4f})")
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
@@ -3,10 +3,9 @@ from agents.annotation_agent.models.actions import PossibleActions
 from agents.annotation_agent.models.annotations import (
     TightnessShape,
 )
-from agents.common.interpreter.base_interpreter import BaseInterpreter
+from agents.common.interpreter.analysis.base_interpreter import BaseInterpreter
 from agents.common.models.contents import ReportContent
 from agents.common.models.shapes import (
-    Label,
     LabeledBox,
     ShapeComparison,
     ShapeLabelComparisonElement,
@@ -31,6 +30,7 @@ class TightnessInterpreter(BaseInterpreter[TightnessStats, list[ReportContent]])
         self,
         section: str,
         sub_section: str,
+        content_name: str = "Box Tightness",
         agent_output=None,
     ) -> list[ReportContent]:
         contents: list[ReportContent] = []
@@ -58,14 +58,14 @@ class TightnessInterpreter(BaseInterpreter[TightnessStats, list[ReportContent]])
                                 y=shape.box[1],
                                 w=shape.box[2],
                                 h=shape.box[3],
-                                label=Label(name=shape.label),
+                                label_id=shape.label_id,
                             ),
                             expected=LabeledBox(
                                 x=shape.suggestion[0],
                                 y=shape.suggestion[1],
                                 w=shape.suggestion[2],
                                 h=shape.suggestion[3],
-                                label=Label(name=shape.label),
+                                label_id=shape.label_id,
                             ),
                         )
                         for shape in filtered_shapes
@@ -78,7 +78,7 @@ class TightnessInterpreter(BaseInterpreter[TightnessStats, list[ReportContent]])
                     data=data,
                     section=section,
                     sub_section=sub_section,
-                    name="Box Tightness",
+                    name=content_name,
                     potential_actions=[PossibleActions.TAG, PossibleActions.DELETE],
                 )
             )
@@ -1,7 +1,16 @@
+import logging
+import time
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
+from typing import NamedTuple
+
 import cv2
 import numpy as np
+import pandas as pd
 import requests
-from picsellia import Asset, Rectangle
+from picsellia import Asset
 from PIL import Image
 
 from agents.annotation_agent.models.annotations import (
@@ -10,7 +19,106 @@ from agents.annotation_agent.models.annotations import (
     TightnessImage,
     TightnessShape,
 )
-from agents.common.ai_models.sam_model import SAMModel
+from agents.common.ai_models.registry import get_sam_model
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class AnnotatedBox(NamedTuple):
+    """An annotated rectangle, in pixels of the original image."""
+
+    id: str
+    x: int
+    y: int
+    w: int
+    h: int
+    label: str
+    label_id: str
+
+
+class AssetBoxes(NamedTuple):
+    asset_id: str
+    annotation_id: str
+    url: str
+    boxes: list[AnnotatedBox]
+
+
+def boxes_from_dataframe(
+    df: pd.DataFrame, asset_ids: list[str] | None = None
+) -> list[AssetBoxes]:
+    """
+    Group the rectangles of the annotation metadata by asset, in the order of
+    `asset_ids` (every asset of `df` when not given).
+    """
+    df = df.dropna(subset=["x", "y", "w", "h"])
+    df = df.assign(asset_id=df["asset_id"].astype(str))
+    if asset_ids is not None:
+        df = df[df["asset_id"].isin(asset_ids)]
+    items = {}
+    for asset_id, group in df.groupby("asset_id", sort=False):
+        first = group.iloc[0]
+        items[asset_id] = AssetBoxes(
+            asset_id=asset_id,
+            annotation_id=str(first["annotation_id"]),
+            url=first["asset_url"],
+            boxes=[
+                AnnotatedBox(
+                    id=str(row.shape_id),
+                    x=int(row.x),
+                    y=int(row.y),
+                    w=int(row.w),
+                    h=int(row.h),
+                    label=str(row.label),
+                    label_id=str(row.label_id),
+                )
+                for row in group.itertuples(index=False)
+            ],
+        )
+    order = asset_ids if asset_ids is not None else list(items)
+    return [items[asset_id] for asset_id in order if asset_id in items]
+
+
+def download_image(url: str) -> Image.Image:
+    response = requests.get(url, timeout=60)
+    response.raise_for_status()
+    image = Image.open(BytesIO(response.content))
+    image.load()
+    return image
+
+
+def iter_downloaded_images(
+    items: list[AssetBoxes], max_workers: int
+) -> Iterator[tuple[AssetBoxes, Image.Image | None]]:
+    """
+    Download and decode the images of `items` on a pool of `max_workers` threads, at
+    most `2 * max_workers` ahead of the consumer, and yield them in order. Images that
+    cannot be downloaded are logged and yielded as None.
+    """
+    max_workers = max(1, max_workers)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending: deque[tuple[AssetBoxes, Future[Image.Image]]] = deque()
+
+        def next_image() -> tuple[AssetBoxes, Image.Image | None]:
+            item, future = pending.popleft()
+            try:
+                return item, future.result()
+            except Exception as e:
+                logger.warning(
+                    f"Could not download image of asset {item.asset_id}: {e}"
+                )
+                return item, None
+
+        try:
+            for item in items:
+                pending.append((item, executor.submit(download_image, item.url)))
+                if len(pending) >= 2 * max_workers:
+                    yield next_image()
+            while pending:
+                yield next_image()
+        finally:
+            for _, future in pending:
+                future.cancel()
 
 
 class TightnessProcessor:
@@ -42,7 +150,7 @@ class TightnessProcessor:
         # Return IoU
         return intersection_area / union_area if union_area > 0 else 0.0
 
-    def generate_tightness_shapes(self, sam_boxes, gt_boxes, rectangles, gt_labels):
+    def generate_tightness_shapes(self, sam_boxes, gt_boxes, annotated_boxes):
         """Generate tightness shapes from SAM and GT boxes."""
         shapes = []
         for i, sam_box in enumerate(sam_boxes):
@@ -53,40 +161,129 @@ class TightnessProcessor:
                     box=gt_boxes[i],
                     suggestion=sam_box,
                     iou=iou,
-                    id=str(rectangles[i].id),
-                    label=gt_labels[i].name,
-                    label_id=str(gt_labels[i].id),
+                    id=annotated_boxes[i].id,
+                    label=annotated_boxes[i].label,
+                    label_id=annotated_boxes[i].label_id,
                 )
             )
         return shapes
 
 
 class SAMProcessor:
-    def __init__(self) -> None:
-        self.sam_model = SAMModel()
+    def __init__(self, batch_size: int = settings.sam_batch_size) -> None:
+        self.sam_model = get_sam_model()
         self.tightness_processor = TightnessProcessor()
+        self.batch_size = max(1, batch_size)
 
     def analyse_image(self, asset: Asset, debug: bool = False) -> TightnessImage:
-        image = Image.open(requests.get(asset.url, stream=True).raw)
-        annotation = asset.list_annotations()[0]
-        rectangles = annotation.list_rectangles()
+        return self.analyse_images([asset], debug=debug)[0]
 
-        sam_boxes, gt_boxes, input_boxes, gt_labels = self._predict(
-            image=image, rectangles=rectangles
-        )
+    def analyse_images(
+        self, assets: list[Asset], debug: bool = False
+    ) -> list[TightnessImage]:
+        """Check the boxes of picsellia assets, fetching their annotation and image."""
+        items = []
+        for asset in assets:
+            annotation = asset.list_annotations()[0]
+            items.append(
+                AssetBoxes(
+                    asset_id=str(asset.id),
+                    annotation_id=str(annotation.id),
+                    url=asset.url,
+                    boxes=[
+                        AnnotatedBox(
+                            id=str(r.id),
+                            x=r.x,
+                            y=r.y,
+                            w=r.w,
+                            h=r.h,
+                            label=r.label.name,
+                            label_id=str(r.label.id),
+                        )
+                        for r in annotation.list_rectangles()
+                    ],
+                )
+            )
+        images = [download_image(item.url) for item in items]
+        return self.analyse_batch(items, images, debug=debug)
 
-        # Generate tightness shapes
-        shapes = self.tightness_processor.generate_tightness_shapes(
-            sam_boxes, gt_boxes, rectangles, gt_labels
-        )
+    def analyse_dataframe(
+        self,
+        df: pd.DataFrame,
+        asset_ids: list[str] | None = None,
+        time_budget: float | None = settings.tightness_time_budget,
+        download_workers: int = settings.tightness_download_workers,
+    ) -> Iterator[TightnessImage]:
+        """
+        Check the boxes of the annotation metadata, asset by asset in the order of
+        `asset_ids`. Images are downloaded ahead by a pool of threads (producers) while
+        this thread runs SAM on batches of `batch_size` images (consumer). No new batch
+        is started once `time_budget` seconds have elapsed.
+        """
+        deadline = time.monotonic() + time_budget if time_budget else None
+        items = boxes_from_dataframe(df, asset_ids)
+        batch_items: list[AssetBoxes] = []
+        batch_images: list[Image.Image] = []
+        analysed = 0
+        for item, image in iter_downloaded_images(items, download_workers):
+            if image is None:
+                continue
+            batch_items.append(item)
+            batch_images.append(image)
+            if len(batch_items) < self.batch_size:
+                continue
+            yield from self.analyse_batch(batch_items, batch_images)
+            analysed += len(batch_items)
+            batch_items, batch_images = [], []
+            if deadline is not None and time.monotonic() > deadline:
+                logger.info(
+                    f"⏱️ Tightness time budget reached after {analysed}/{len(items)} images."
+                )
+                return
+        if batch_items:
+            yield from self.analyse_batch(batch_items, batch_images)
+
+    def analyse_batch(
+        self,
+        items: list[AssetBoxes],
+        images: list[Image.Image],
+        debug: bool = False,
+    ) -> list[TightnessImage]:
+        """
+        Check the boxes of several images. Images are segmented `batch_size` at a
+        time, once each, and all the boxes of an image are matched against it.
+        """
+        predictions = []
+        for start in range(0, len(items), self.batch_size):
+            batch = slice(start, start + self.batch_size)
+            predictions.extend(
+                self._predict(
+                    images=images[batch],
+                    boxes=[item.boxes for item in items[batch]],
+                )
+            )
 
-        if debug:
-            self._debug_plot(image, sam_boxes, gt_boxes, input_boxes, asset.id)
+        results = []
+        for item, image, prediction in zip(items, images, predictions, strict=True):
+            sam_boxes, gt_boxes, input_boxes, kept_boxes = prediction
 
-        return TightnessImage(
-            asset_id=str(asset.id),
-            annotation=TightnessAnnotation(id=str(annotation.id), shapes=shapes),
-        )
+            # Generate tightness shapes
+            shapes = self.tightness_processor.generate_tightness_shapes(
+                sam_boxes, gt_boxes, kept_boxes
+            )
+
+            if debug:
+                self._debug_plot(image, sam_boxes, gt_boxes, input_boxes, item.asset_id)
+
+            results.append(
+                TightnessImage(
+                    asset_id=item.asset_id,
+                    annotation=TightnessAnnotation(
+                        id=item.annotation_id, shapes=shapes
+                    ),
+                )
+            )
+        return results
 
     def _resize_image(self, image: Image, input_size: int = 1024):
         w, h = image.size
@@ -96,19 +293,13 @@ class SAMProcessor:
         image = image.resize((new_w, new_h))
         return image, scale
 
-    def _predict(self, image: Image, rectangles: list[Rectangle]):
-        rescale_image, scale = self._resize_image(image, 1024)
-
-        img_w, img_h = image.size[:2]
-        rimg_w, rimg_h = rescale_image.size[:2]
-
-        # Prepare the input boxes for inference
+    def _box_prompts(
+        self, boxes: list[AnnotatedBox], scale: float, rescaled_size: tuple
+    ) -> list[list[int]]:
+        """Boxes to prompt FastSAM with, slightly expanded, on the rescaled image."""
+        rimg_w, rimg_h = rescaled_size
         box_prompts = []
-        input_labels = []
-        gt_boxes = []
-        gt_labels = []
-
-        for r in rectangles:
+        for r in boxes:
             x1 = int(r.x * scale)
             y1 = int(r.y * scale)
             x2 = int((r.x + r.w) * scale)
@@ -121,24 +312,42 @@ class SAMProcessor:
             expanded_y2 = int(min(y2 * 1.1, rimg_h - 1))
 
             box_prompts.append([expanded_x1, expanded_y1, expanded_x2, expanded_y2])
-            input_labels.append(f"a photo of a {r.label.name}")
-            gt_boxes.append([r.x, r.y, r.w, r.h])
-            gt_labels.append(r.label)
-
-        # Predict with SAM and post-process the results
-        sam_results = []
-        for i, box_prompt in enumerate(box_prompts):
-            results = self.sam_model.predict(
-                image=rescale_image, box_prompt=box_prompt, label=input_labels[i]
+        return box_prompts
+
+    def _predict(self, images: list[Image], boxes: list[list[AnnotatedBox]]):
+        rescaled_images = []
+        box_prompts = []
+        for image, image_boxes in zip(images, boxes, strict=True):
+            rescale_image, scale = self._resize_image(image, 1024)
+            rescaled_images.append(rescale_image)
+            box_prompts.append(
+                self._box_prompts(image_boxes, scale, rescale_image.size[:2])
             )
-            sam_results.append(results)
 
-        # Post-process the results
-        sam_boxes = []
-        for results in sam_results:
-            sam_boxes.extend(self.sam_model.post_process(results, (img_w, img_h)))
+        # Predict with SAM, one pass for all the images and their boxes
+        sam_results = self.sam_model.predict(
+            images=rescaled_images, box_prompts=box_prompts
+        )
 
-        return sam_boxes, gt_boxes, box_prompts, gt_labels
+        predictions = []
+        for image, image_boxes, prompts, results in zip(
+            images, boxes, box_prompts, sam_results, strict=True
+        ):
+            # Boxes without any segmented mask get no suggestion
+            found = np.isfinite(results).all(axis=1)
+            kept_boxes = [
+                box for box, keep in zip(image_boxes, found, strict=True) if keep
+            ]
+            sam_boxes = self.sam_model.post_process(results[found], image.size[:2])
+            predictions.append(
+                (
+                    [tuple(box) for box in sam_boxes.tolist()],
+                    [[box.x, box.y, box.w, box.h] for box in kept_boxes],
+                    [p for p, keep in zip(prompts, found, strict=True) if keep],
+                    kept_boxes,
+                )
+            )
+        return predictions
 
     def _debug_plot(self, image, sam_boxes, gt_boxes, input_boxes, asset_id):
         """Visualize SAM and GT boxes for debugging."""
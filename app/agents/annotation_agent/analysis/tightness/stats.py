@@ -1,7 +1,6 @@
 from typing import Any
 
 import pandas as pd
-import picsellia
 
 from agents.annotation_agent.analysis.tightness.sam_processor import SAMProcessor
 from agents.annotation_agent.models.annotations import TightnessImage
@@ -10,19 +9,19 @@ from agents.common.charts.types import (
     ChartType,
 )
 from agents.common.stats.analysis.base_chart_stats import BaseChartStats
+from config.settings import settings
 
 
 class TightnessStats(BaseChartStats["TightnessStats"]):
     def __init__(
         self,
         df: pd.DataFrame,
-        dataset: picsellia.DatasetVersion,
         asset_ids: list[str] | None = None,
+        time_budget: float | None = settings.tightness_time_budget,
     ):
         super().__init__(df=df)
         self.asset_ids = asset_ids
-
-        self.dataset = dataset
+        self.time_budget = time_budget
 
         self.SAMProcessor = SAMProcessor()
 
@@ -181,33 +180,45 @@ class TightnessStats(BaseChartStats["TightnessStats"]):
     def _run_on_dataset(
         self,
     ) -> list[TightnessImage]:
-        asset_ids = self.asset_ids or self.df["asset_id"].unique().tolist()
+        asset_ids = self.asset_ids or self.df["asset_id"].astype(str).unique().tolist()
         print(f"🔍 Running SAM on {len(asset_ids)} images...")
+        sizes = (
+            self.df.assign(asset_id=self.df["asset_id"].astype(str))
+            .groupby("asset_id")[["image_width", "image_height"]]
+            .first()
+        )
         results = []
-        for asset_id in asset_ids:
-            asset = self.dataset.find_asset(id=asset_id)
-            result: TightnessImage = self.SAMProcessor.analyse_image(
-                asset=asset,
-            )
-            if result:
-                results.append(result)
-                for shape in result.annotation.shapes:
-                    mask = self.temp_df["shape_id"].eq(str(shape.id))
-                    if mask.any():
-                        self.temp_df.loc[mask, "suggested_nx"] = (
-                            shape.suggestion[0] / asset.width
-                        )
-                        self.temp_df.loc[mask, "suggested_ny"] = (
-                            shape.suggestion[1] / asset.height
-                        )
-                        self.temp_df.loc[mask, "suggested_nw"] = (
-                            shape.suggestion[2] / asset.width
-                        )
-                        self.temp_df.loc[mask, "suggested_nh"] = (
-                            shape.suggestion[3] / asset.height
-                        )
-                        self.temp_df.loc[mask, "iou"] = shape.iou
-                        self.temp_df.loc[mask, "image_width"] = asset.width
-                        self.temp_df.loc[mask, "image_height"] = asset.height
+        suggestions: dict[str, tuple] = {}
+        for result in self.SAMProcessor.analyse_dataframe(
+            self.df, asset_ids=asset_ids, time_budget=self.time_budget
+        ):
+            results.append(result)
+            width, height = sizes.loc[result.asset_id]
+            for shape in result.annotation.shapes:
+                suggestions[str(shape.id)] = (
+                    shape.suggestion[0] / width,
+                    shape.suggestion[1] / height,
+                    shape.suggestion[2] / width,
+                    shape.suggestion[3] / height,
+                    shape.iou,
+                    width,
+                    height,
+                )
+
+        columns = [
+            "suggested_nx",
+            "suggested_ny",
+            "suggested_nw",
+            "suggested_nh",
+            "iou",
+            "image_width",
+            "image_height",
+        ]
+        shape_ids = self.temp_df["shape_id"].astype(str)
+        found = shape_ids.isin(suggestions.keys())
+        if found.any():
+            self.temp_df.loc[found, columns] = [
+                suggestions[shape_id] for shape_id in shape_ids[found]
+            ]
         # self.temp_df.to_csv("temp.csv")
         return results
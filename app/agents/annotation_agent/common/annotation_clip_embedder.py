@@ -4,6 +4,8 @@ from typing import Any
 from picsellia import Asset
 from picsellia.types.enums import InferenceType
 
+from agents.common.embedding_store import EmbeddingStore
+
 from .asset_annotation_processor import AssetAnnotationProcessor
 
 # Configure the logger
@@ -17,7 +19,7 @@ class AnnotationCLIPEmbedder:
         self.annotation_processor = AssetAnnotationProcessor(dataset_type)
 
     def compute_clip_embeddings_from_annotations(
-        self, asset: Asset, embeddings_map: dict
+        self, asset: Asset, embeddings_map: EmbeddingStore
     ) -> tuple[str, dict[str, dict[str, Any]]]:
         """
         Compute CLIP embeddings for each rectangle (or bounding box derived from polygon) in
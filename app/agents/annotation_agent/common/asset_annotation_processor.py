@@ -122,6 +122,13 @@ class AssetAnnotationProcessor:
         padded.paste(image, ((new_width - width) // 2, (new_height - height) // 2))
         return padded
 
+    def list_shapes(
+        self, annotation: picsellia.Annotation
+    ) -> dict[str, dict[str, Any]]:
+        """Metadata of the shapes of an annotation that `process_asset` keeps, by id."""
+        _, extra_metadata = self._prepare_crops(self._process_annotation(annotation))
+        return extra_metadata
+
     def process_asset(
         self, asset: picsellia.Asset
     ) -> tuple[str, list[str], dict[str, dict[str, Any]]]:
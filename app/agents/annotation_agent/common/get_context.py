@@ -4,6 +4,7 @@ import pandas as pd
 import picsellia
 import requests
 
+from agents.common.embedding_store import embeddings_to_lists
 from agents.common.metadata.annotation_metadata_processor import (
     AnnotationMetadataProcessor,
 )
@@ -18,6 +19,7 @@ class PContext:
         context_service: ContextService,
         image_metadata: pd.DataFrame,
         force_recompute: bool = True,
+        incremental: bool = False,
         ctx_path: str | None = None,
         local: bool = False,
     ):
@@ -26,6 +28,7 @@ class PContext:
         self.context_service = context_service
         self.dataset_id = context_service.dataset_id
         self.local = local
+        self.incremental = incremental
         self.metadata = None
         self.final_analysis = None
         self.client = context_service.client
@@ -76,10 +79,23 @@ class PContext:
             context_service=self.context_service,
             dataset_version=dataset,
             image_metadata=self.image_metadata,
+            previous_metadata=self._get_previous_metadata(),
         ).process()
         # Use ContextService to sync metadata and upload to remote storage
         self.context_service.sync_metadata(self.df)
-        self.context_service.upload_metadata_to_s3(agent_type="annotation_agent")
+        self.context_service.upload_metadata_to_s3(
+            agent_type="annotation_agent", metadata=self.df
+        )
+
+    def _get_previous_metadata(self) -> pd.DataFrame | None:
+        """Metadata stored by the last run of this report, used as baseline in incremental mode."""
+        if not self.incremental:
+            return None
+        previous = self.context_service.get_metadata(agent_type="annotation_agent")
+        if isinstance(previous, pd.DataFrame) and not previous.empty:
+            return previous
+        logger.info("No previous metadata found, computing the full context.")
+        return None
 
     def get(self, cols: list | None = None) -> pd.DataFrame:
         standard_columns = ["asset_id", "annotation_id"]
@@ -91,9 +107,11 @@ class PContext:
     def sync(self) -> None:
         """Sync context data to the remote dataset or save it locally."""
         if self.local:
-            self.df.to_csv(self.ctx_path, index=False)
+            embeddings_to_lists(self.df).to_csv(self.ctx_path, index=False)
             logger.info(f"Context synced to local file: {self.ctx_path}")
         else:
             self.context_service.sync_metadata(self.df)
-            self.context_service.upload_metadata_to_s3(agent_type="annotation_agent")
+            self.context_service.upload_metadata_to_s3(
+                agent_type="annotation_agent", metadata=self.df
+            )
             logger.info(f"Context synced to remote dataset: {self.dataset_id}")
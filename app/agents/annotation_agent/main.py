@@ -1,4 +1,3 @@
-import traceback
 from typing import Any
 
 import pandas as pd
@@ -6,24 +5,23 @@ from picsellia import DatasetVersion
 
 from agents.annotation_agent.common.get_context import PContext
 from agents.annotation_agent.tools import ALL_TOOLS
+from agents.common.tool_scheduler import run_tools
 from services.context import ContextService
 
 
 def run_analysis(pctx: PContext) -> PContext:
-    for tool in ALL_TOOLS:
-        try:
-            tool(pctx)
-        except Exception:
-            print(f"❌ Tool `{tool.__name__}` failed:")
-            print(traceback.format_exc())
+    run_tools(pctx, ALL_TOOLS)
     pctx.sync()
     return pctx
 
 
 class AnnotationAnalysisTool:
-    def __init__(self, context_service: ContextService, **kwargs) -> None:
+    def __init__(
+        self, context_service: ContextService, incremental: bool = False, **kwargs
+    ) -> None:
         super().__init__(**kwargs)
         self.context_service = context_service
+        self.incremental = incremental
         self.client = context_service.client
         self.dataset: DatasetVersion = self.client.get_dataset_version_by_id(
             context_service.dataset_id
@@ -31,7 +29,9 @@ class AnnotationAnalysisTool:
 
     def forward(self, image_metadata: pd.DataFrame) -> dict[str, Any] | None:
         pctx = PContext(
-            context_service=self.context_service, image_metadata=image_metadata
+            context_service=self.context_service,
+            image_metadata=image_metadata,
+            incremental=self.incremental,
         )
         pctx = run_analysis(pctx)
         return pctx.final_analysis
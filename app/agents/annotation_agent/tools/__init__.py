@@ -1,9 +1,17 @@
+from agents.common.tool_scheduler import ToolSpec
+
 from .analyze_class_overlap import analyze_class_overlap
 from .analyze_intra_class_embeddings import analyze_intra_class_embeddings
 from .analyze_objet_shapes import analyze_object_shapes
 
 ALL_TOOLS = [
-    analyze_object_shapes,
-    analyze_class_overlap,
-    analyze_intra_class_embeddings,
+    ToolSpec(
+        analyze_object_shapes,
+        inputs=("label", "x", "y", "w", "h", "image_width", "image_height"),
+    ),
+    ToolSpec(
+        analyze_class_overlap,
+        inputs=("label", "label_id", "x", "y", "w", "h", "image_width", "image_height"),
+    ),
+    ToolSpec(analyze_intra_class_embeddings, inputs=("label", "shape_embeddings")),
 ]
@@ -1,4 +1,5 @@
 import logging
+import math
 
 from pydantic_ai import Agent
 
@@ -6,12 +7,13 @@ from agents.ai_models import report_model
 from agents.annotation_agent.analysis.tightness.interpreter import TightnessInterpreter
 from agents.annotation_agent.analysis.tightness.stats import TightnessStats
 from agents.annotation_agent.common.get_context import PContext
-from agents.common.interpreter.merged_report_builder import MergedReportBuilder
-from agents.common.interpreter.multi_chart_stats_interpreter import (
+from agents.common.interpreter.analysis.multi_chart_stats_interpreter import (
     MultiChartStatsInterpreter,
 )
+from agents.common.interpreter.merged_report_builder import MergedReportBuilder
 from agents.common.models.contents import ReportContent
 from agents.prompts.generator import PromptGenerator
+from config.settings import settings
 from services.report_enums import SubSectionName
 
 per_chart_prompt_tightness = """
@@ -77,25 +79,43 @@ per_chart_analysis_agent_tightness = Agent(
 
 
 def find_tightness_issues(pctx: PContext) -> list[ReportContent]:
-    df = pctx.get(["shape_id", "shape", "x", "y", "w", "h", "label"])
+    df = pctx.get(
+        [
+            "shape_id",
+            "x",
+            "y",
+            "w",
+            "h",
+            "label",
+            "label_id",
+            "asset_url",
+            "image_width",
+            "image_height",
+        ]
+    )
 
     if "x" not in df.columns or "y" not in df.columns:
         logger.info("⚠️ Missing 'x' or 'y' columns. Skipping tightness stats analysis.")
         return []
 
     logger.info("📊 Running tightness stats analysis...")
-    unique_ids = df["asset_id"].unique()[:5]
-    target_ids: list[str] = [str(uid) for uid in unique_ids]
+    # Random order, so that a run cut short by the time budget is still a uniform sample
+    unique_ids = df["asset_id"].astype(str).drop_duplicates()
+    sample_size = math.ceil(len(unique_ids) * settings.tightness_sample_fraction)
+    if settings.tightness_max_assets is not None:
+        sample_size = min(sample_size, settings.tightness_max_assets)
+    target_ids: list[str] = unique_ids.sample(n=sample_size, random_state=0).tolist()
 
-    logger.info(f"🔍 Running SAM on {len(target_ids)} images...")
-    stats = TightnessStats(df=df, dataset=pctx.dataset, asset_ids=target_ids).compute()
+    logger.info(f"🔍 Running SAM on up to {len(target_ids)} images...")
+    stats = TightnessStats(df=df, asset_ids=target_ids).compute()
 
     logger.info("🧠 Running LLM-based tightness suggestion analysis...")
     tightness_suggestions_contents = TightnessInterpreter(
         stats=stats, min_treshold=0.5, max_treshold=0.9
     ).run(
-        section=SubSectionName.TIGHTNESS.section.value,
-        sub_section=SubSectionName.TIGHTNESS.name,
+        section=SubSectionName.SINGLE_OBJECT_ANALYSIS.section.value,
+        sub_section=SubSectionName.SINGLE_OBJECT_ANALYSIS.name,
+        content_name="Box Tightness",
     )
 
     logger.info("🧠 Running LLM interpretation for tightness charts...")
@@ -105,15 +125,15 @@ def find_tightness_issues(pctx: PContext) -> list[ReportContent]:
         prompt=prompt,
     ).interpret_group_to_content(
         group_name="tightness",
-        section=SubSectionName.TIGHTNESS.section.value,
-        sub_section=SubSectionName.TIGHTNESS.name,
+        section=SubSectionName.SINGLE_OBJECT_ANALYSIS.section.value,
+        sub_section=SubSectionName.SINGLE_OBJECT_ANALYSIS.name,
         name="Tightness Box Plots Analysis",
     )
 
     logger.info("🧬 Merging charts + shape suggestions into single report...")
     merged_content = MergedReportBuilder(
         [chart_content] + tightness_suggestions_contents,
-        title="Full Tightness Analysis",
+        content_name="Full Tightness Analysis",
     ).build()
 
     pctx.context_service.sync_content(merged_content)
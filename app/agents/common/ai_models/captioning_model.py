@@ -4,6 +4,8 @@ import torch
 from PIL import Image
 from transformers import BlipForConditionalGeneration, BlipProcessor
 
+from agents.common.ai_models.quantization import probe_image, quantize_for_cpu
+
 
 class CaptioningModel:
     def __init__(self) -> None:
@@ -21,20 +23,37 @@ class CaptioningModel:
             "Salesforce/blip-image-captioning-base"
         ).to(self.device)
         self.model.eval()
+        self.model = quantize_for_cpu(self.model, self.device, self._probe)
+
+    def _probe(self, model: BlipForConditionalGeneration) -> torch.Tensor:
+        """Caption prompt logits compared between the fp32 and int8 models."""
+        inputs = self.processor(
+            images=probe_image(), text="a picture of", return_tensors="pt"
+        )
+        return model(**inputs).logits
 
     def generate_caption(self, image: Image.Image) -> str:
         """
         Generate a caption for a given image using the BLIP model.
         """
-        inputs = self.processor(image, return_tensors="pt").to(self.device)
+        return self.generate_captions([image])[0]
+
+    def generate_captions(self, images: list[Image.Image]) -> list[str]:
+        """
+        Generate the captions of a batch of images with a single `generate` call.
+        Memory is released once for the whole batch.
+        """
+        if not images:
+            return []
+        inputs = self.processor(images=images, return_tensors="pt").to(self.device)
 
         with torch.no_grad():
             out = self.model.generate(**inputs)
 
-        caption = self.processor.decode(out[0], skip_special_tokens=True)
+        captions = self.processor.batch_decode(out, skip_special_tokens=True)
         del inputs
         del out
         gc.collect()
         torch.cuda.empty_cache() if torch.cuda.is_available() else None
 
-        return caption
+        return captions
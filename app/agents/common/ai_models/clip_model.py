@@ -2,6 +2,13 @@ import torch
 from PIL import Image
 from transformers import CLIPModel, CLIPProcessor
 
+from agents.common.ai_models.quantization import probe_image, quantize_for_cpu
+from agents.common.ai_models.text_embedding_cache import TextEmbeddingCache
+
+MODEL_NAME = "openai/clip-vit-base-patch32"
+PROMPT_TEMPLATE = "a {label}"
+TEXT_BATCH_SIZE = 256
+
 
 class CLIPModelHandler:
     def __init__(self) -> None:
@@ -13,11 +20,33 @@ class CLIPModelHandler:
             if torch.mps.is_available()
             else "cpu"
         )
-        self.model = CLIPModel.from_pretrained("openai/clip-vit-base-patch32").to(
-            self.device
-        )
+        self.model = CLIPModel.from_pretrained(MODEL_NAME).to(self.device)
         self.model.eval()
-        self.processor = CLIPProcessor.from_pretrained("openai/clip-vit-base-patch32")
+        self.processor = CLIPProcessor.from_pretrained(MODEL_NAME)
+        model = self.model
+        self.model = quantize_for_cpu(model, self.device, self._probe)
+        # int8 and fp32 embeddings differ slightly, they are cached apart
+        precision = "fp32" if self.model is model else "int8"
+        self.text_cache = TextEmbeddingCache(MODEL_NAME, PROMPT_TEMPLATE, precision)
+        self.text_embeddings: dict[str, list[float]] = {}
+
+    def _probe(self, model: CLIPModel) -> torch.Tensor:
+        """Text and image features compared between the fp32 and int8 models."""
+        inputs = self.processor(
+            text=[PROMPT_TEMPLATE.format(label=label) for label in ("person", "car")],
+            images=probe_image(),
+            return_tensors="pt",
+            padding=True,
+        )
+        return torch.cat(
+            [
+                model.get_text_features(
+                    input_ids=inputs["input_ids"],
+                    attention_mask=inputs["attention_mask"],
+                ),
+                model.get_image_features(pixel_values=inputs["pixel_values"]),
+            ]
+        )
 
     def compute_image_embeddings(self, images: list[Image]) -> list[list[float]]:
         """Computes embeddings for a batch of images."""
@@ -35,17 +64,34 @@ class CLIPModelHandler:
             features.extend(batch_feats)
         return features
 
-    def compute_text_embeddings(self, labels: list[str]) -> dict[str, list[float]]:
-        """Computes embeddings for a list of text labels."""
-        label_embeddings = {}
-        for label in labels:
-            prompt = f"a {label}"
-            inputs = self.processor(text=prompt, return_tensors="pt", padding=True).to(
-                self.device
-            )
+    def compute_text_embeddings(
+        self, labels: list[str], batch_size: int = TEXT_BATCH_SIZE
+    ) -> dict[str, list[float]]:
+        """
+        Computes embeddings for a list of text labels, `batch_size` prompts per
+        forward pass. Embeddings already computed by this process or found in the
+        text embeddings cache are reused.
+        """
+        labels = list(dict.fromkeys(labels))
+        missing = [label for label in labels if label not in self.text_embeddings]
+        self.text_embeddings.update(self.text_cache.lookup(missing))
+
+        missing = [label for label in missing if label not in self.text_embeddings]
+        computed: dict[str, list[float]] = {}
+        for i in range(0, len(missing), batch_size):
+            batch = missing[i : i + batch_size]
+            inputs = self.processor(
+                text=[PROMPT_TEMPLATE.format(label=label) for label in batch],
+                return_tensors="pt",
+                padding=True,
+                truncation=True,
+            ).to(self.device)
             with torch.no_grad():
                 text_features = (
                     self.model.get_text_features(**inputs).cpu().numpy().tolist()
                 )
-            label_embeddings[label] = text_features[0]
-        return label_embeddings
+            computed.update(zip(batch, text_features, strict=True))
+        self.text_cache.store(computed)
+        self.text_embeddings.update(computed)
+
+        return {label: self.text_embeddings[label] for label in labels}
@@ -0,0 +1,54 @@
+import copy
+import logging
+from collections.abc import Callable
+
+import numpy as np
+import torch
+from PIL import Image
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def probe_image(size: int = 384) -> Image.Image:
+    """A deterministic, textured image to compare model outputs on."""
+    x, y = np.meshgrid(np.linspace(0, 1, size), np.linspace(0, 1, size))
+    # Gradients plus a pattern, so that the activations are not degenerate
+    pixels = np.stack([x, y, 0.5 + 0.5 * np.sin(12 * np.pi * x * y)], axis=-1)
+    return Image.fromarray((pixels * 255).astype(np.uint8))
+
+
+def quantize_for_cpu(
+    model: torch.nn.Module,
+    device: torch.device,
+    probe: Callable[[torch.nn.Module], torch.Tensor],
+    backend: str = settings.cpu_inference_backend,
+    min_similarity: float = settings.int8_min_similarity,
+) -> torch.nn.Module:
+    """
+    Apply dynamic int8 quantization to the linear layers of a model running on CPU,
+    when the "int8" backend is selected. The outputs of `probe` are compared to the
+    fp32 ones, and the fp32 model is kept when their cosine similarity (per output
+    row) falls under `min_similarity`.
+    """
+    if backend != "int8" or device.type != "cpu":
+        return model
+
+    quantized = torch.ao.quantization.quantize_dynamic(
+        copy.deepcopy(model), {torch.nn.Linear}, dtype=torch.qint8
+    )
+    with torch.no_grad():
+        reference = probe(model).float().flatten(1)
+        output = probe(quantized).float().flatten(1)
+    similarity = torch.nn.functional.cosine_similarity(reference, output, dim=1).min()
+    name = type(model).__name__
+    if similarity < min_similarity:
+        logger.warning(
+            f"⚠️ Keeping fp32 {name}, int8 outputs only have a {similarity:.4f} "
+            f"cosine similarity with the fp32 ones (< {min_similarity})"
+        )
+        return model
+
+    logger.info(f"Using int8 {name} (cosine similarity to fp32: {similarity:.4f})")
+    return quantized
@@ -0,0 +1,151 @@
+import gc
+import logging
+import os
+import sys
+import threading
+from collections import OrderedDict
+from collections.abc import Callable, Iterable
+from typing import TYPE_CHECKING, Any
+
+from config.settings import settings
+
+if TYPE_CHECKING:
+    from agents.common.ai_models.captioning_model import CaptioningModel
+    from agents.common.ai_models.clip_model import CLIPModelHandler
+    from agents.common.ai_models.sam_model import SAMModel
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    Process-wide cache of the AI models, each loaded once on first use and then
+    shared by every analysis running in the process (e.g. a Celery worker child).
+
+    Models are kept in least recently used order. When more than `max_models` are
+    loaded, or when the resident memory of the process goes over `memory_limit_mb`
+    after a load, the least recently used models are released.
+    """
+
+    def __init__(
+        self,
+        max_models: int | None = settings.max_loaded_models,
+        memory_limit_mb: int | None = settings.models_memory_limit_mb,
+    ):
+        self.max_models = max_models
+        self.memory_limit_mb = memory_limit_mb
+        self._factories: dict[str, Callable[[], Any]] = {}
+        self._models: OrderedDict[str, Any] = OrderedDict()
+        self._lock = threading.RLock()
+
+    def register(self, name: str, factory: Callable[[], Any]) -> None:
+        with self._lock:
+            self._factories[name] = factory
+
+    def get(self, name: str) -> Any:
+        """Return the model `name`, loading it if needed."""
+        with self._lock:
+            if name in self._models:
+                self._models.move_to_end(name)
+                return self._models[name]
+
+            if name not in self._factories:
+                raise KeyError(f"Unknown model {name!r}")
+            logger.info(f"Loading model {name}...")
+            model = self._factories[name]()
+            self._models[name] = model
+            self._evict(keep=name)
+            return model
+
+    def preload(self, names: Iterable[str]) -> None:
+        """Load models ahead of the first analysis, e.g. when a worker starts."""
+        for name in names:
+            try:
+                self.get(name)
+            except Exception:
+                logger.exception(f"Could not preload model {name}")
+
+    def release(self, name: str | None = None) -> None:
+        """Release one model, or all of them, and the memory they hold."""
+        with self._lock:
+            names = [name] if name is not None else list(self._models)
+            for model_name in names:
+                if self._models.pop(model_name, None) is not None:
+                    logger.info(f"Released model {model_name}")
+        _free_memory()
+
+    def loaded(self) -> list[str]:
+        with self._lock:
+            return list(self._models)
+
+    def _evict(self, keep: str) -> None:
+        # The memory is checked again after each release, so only as many models
+        # as needed are dropped
+        while len(self._models) > 1 and (
+            (self.max_models is not None and len(self._models) > self.max_models)
+            or self._over_memory_limit()
+        ):
+            name = next(model for model in self._models if model != keep)
+            del self._models[name]
+            logger.info(f"Evicted model {name} to free memory")
+            _free_memory()
+
+    def _over_memory_limit(self) -> bool:
+        if self.memory_limit_mb is None:
+            return False
+        rss = _resident_memory_mb()
+        return rss is not None and rss > self.memory_limit_mb
+
+
+def _resident_memory_mb() -> float | None:
+    """Current resident memory of the process, None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as statm:
+            pages = int(statm.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE") / 1024**2
+
+
+def _free_memory() -> None:
+    gc.collect()
+    # Only touch torch when a model already imported it
+    torch = sys.modules.get("torch")
+    if torch is not None and torch.cuda.is_available():
+        torch.cuda.empty_cache()
+
+
+def _load_clip() -> "CLIPModelHandler":
+    from agents.common.ai_models.clip_model import CLIPModelHandler
+
+    return CLIPModelHandler()
+
+
+def _load_captioning() -> "CaptioningModel":
+    from agents.common.ai_models.captioning_model import CaptioningModel
+
+    return CaptioningModel()
+
+
+def _load_sam() -> "SAMModel":
+    from agents.common.ai_models.sam_model import SAMModel
+
+    return SAMModel()
+
+
+model_registry = ModelRegistry()
+model_registry.register("clip", _load_clip)
+model_registry.register("captioning", _load_captioning)
+model_registry.register("sam", _load_sam)
+
+
+def get_clip_model() -> "CLIPModelHandler":
+    return model_registry.get("clip")
+
+
+def get_captioning_model() -> "CaptioningModel":
+    return model_registry.get("captioning")
+
+
+def get_sam_model() -> "SAMModel":
+    return model_registry.get("sam")
@@ -1,6 +1,8 @@
+import numpy as np
 import torch
 from PIL import Image
 from ultralytics import FastSAM
+from ultralytics.utils.ops import scale_masks
 
 from config.settings import settings
 
@@ -14,31 +16,53 @@ class SAMModel:
             else ("0" if torch.cuda.is_available() else "cpu")
         )
 
-    def predict(self, image: Image, box_prompt: list, label: str):
-        """Uses the SAM model to predict boxes from an image."""
+    def predict(
+        self, images: list[Image.Image], box_prompts: list[list[list[int]]]
+    ) -> list[np.ndarray]:
+        """
+        Segment a batch of images in a single FastSAM pass, and match every box prompt
+        (x1, y1, x2, y2) of an image against that same segmentation. Returns, for each
+        image, the normalized xywh boxes of the selected masks, one row per prompt (NaN
+        when nothing was segmented).
+        """
+        boxes = [np.empty((0, 4), dtype=np.float32) for _ in images]
+        prompted = [i for i, prompts in enumerate(box_prompts) if prompts]
+        if not prompted:
+            return boxes
+
         results = self.model(
-            image,
-            labels=label,
-            bboxes=box_prompt,
-            device=self.device,
-            verbose=False,
+            [images[i] for i in prompted], device=self.device, verbose=False
         )
-        return results[0]
+        for i, result in zip(prompted, results, strict=True):
+            boxes[i] = self._select_boxes(result, box_prompts[i])
+        return boxes
 
-    def post_process(self, results, image_size: tuple):
-        """Post-process the results to get final box coordinates."""
-        sam_boxes = []
-        img_w, img_h = image_size
+    def _select_boxes(self, result, box_prompts: list[list[int]]) -> np.ndarray:
+        """
+        Pick for each box prompt the mask with the highest IoU with the box, like the
+        box prompt of FastSAM does for a single box.
+        """
+        if len(result) == 0:
+            return np.full((len(box_prompts), 4), np.nan, dtype=np.float32)
 
-        for result in results:
-            x, y, w, h = result.boxes.xywhn.cpu().numpy()[0]
-            # Adjust the box coordinates according to the original image size
-            adjusted_x = (x - w / 2) * img_w
-            adjusted_y = (y - h / 2) * img_h
-            adjusted_w = w * img_w
-            adjusted_h = h * img_h
-            sam_boxes.append(
-                (int(adjusted_x), int(adjusted_y), int(adjusted_w), int(adjusted_h))
-            )
-
-        return sam_boxes
+        masks = result.masks.data
+        if masks.shape[1:] != result.orig_shape:
+            masks = scale_masks(masks[None], result.orig_shape)[0]
+        bboxes = torch.as_tensor(box_prompts, dtype=torch.int32, device=masks.device)
+        bbox_areas = (bboxes[:, 3] - bboxes[:, 1]) * (bboxes[:, 2] - bboxes[:, 0])
+        mask_areas = torch.stack(
+            [masks[:, b[1] : b[3], b[0] : b[2]].sum(dim=(1, 2)) for b in bboxes]
+        )
+        full_mask_areas = torch.sum(masks, dim=(1, 2))
+        union = bbox_areas[:, None] + full_mask_areas - mask_areas
+        selected = torch.argmax(mask_areas / union, dim=1)
+        return result.boxes.xywhn[selected].cpu().numpy()
+
+    def post_process(self, boxes: np.ndarray, image_size: tuple) -> np.ndarray:
+        """Convert normalized xywh boxes to (x, y, w, h) pixels of the original image."""
+        img_w, img_h = image_size
+        x, y, w, h = boxes.T
+        # Adjust the box coordinates according to the original image size
+        return np.stack(
+            [(x - w / 2) * img_w, (y - h / 2) * img_h, w * img_w, h * img_h], axis=1
+        ).astype(int)
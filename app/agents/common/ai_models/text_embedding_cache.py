@@ -0,0 +1,73 @@
+import hashlib
+import logging
+from typing import Literal
+
+import numpy as np
+
+from config.settings import settings
+from services.redis_config import redis_client as cache
+
+logger = logging.getLogger(__name__)
+
+
+class TextEmbeddingCache:
+    """
+    Cache of text embeddings keyed by model, precision of the model (fp32 or int8,
+    see `quantize_for_cpu`), prompt template and text.
+
+    Label names are shared by every version of a dataset, and often across datasets,
+    so their embeddings only need to be computed once. Embeddings are stored as raw
+    little-endian float32 bytes. Cache errors are logged and treated as misses.
+    """
+
+    VERSION = 2
+    BATCH_SIZE = 500
+
+    def __init__(
+        self,
+        model_name: str,
+        prompt_template: str,
+        precision: str = "fp32",
+        backend: Literal["redis", "none"] = settings.text_embeddings_cache,
+        ttl: int = settings.text_embeddings_cache_ttl,
+    ):
+        self.backend = backend
+        self.ttl = ttl
+        # The template is hashed so that its braces and spaces stay out of the keys
+        template = hashlib.sha1(prompt_template.encode()).hexdigest()[:12]
+        self.prefix = (
+            f"text_embeddings:v{self.VERSION}:{model_name}:{precision}:{template}:"
+        )
+
+    def lookup(self, texts: list[str]) -> dict[str, list[float]]:
+        """Fetch the cached embeddings of `texts`, missing ones are left out."""
+        if self.backend == "none" or not texts:
+            return {}
+
+        embeddings = {}
+        try:
+            for start in range(0, len(texts), self.BATCH_SIZE):
+                batch = texts[start : start + self.BATCH_SIZE]
+                values = cache.mget([self.prefix + text for text in batch])
+                for text, value in zip(batch, values, strict=True):
+                    if value:
+                        embeddings[text] = np.frombuffer(value, dtype="<f4").tolist()
+        except Exception:
+            logger.warning("Could not read the text embeddings cache", exc_info=True)
+            return {}
+        return embeddings
+
+    def store(self, embeddings: dict[str, list[float]]) -> None:
+        if self.backend == "none" or not embeddings:
+            return
+
+        texts = list(embeddings)
+        try:
+            for start in range(0, len(texts), self.BATCH_SIZE):
+                pipeline = cache.pipeline(transaction=False)
+                for text in texts[start : start + self.BATCH_SIZE]:
+                    value = np.asarray(embeddings[text], dtype="<f4").tobytes()
+                    pipeline.set(self.prefix + text, value, ex=self.ttl)
+                pipeline.execute()
+        except Exception:
+            logger.warning("Could not write the text embeddings cache", exc_info=True)
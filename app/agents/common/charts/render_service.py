@@ -0,0 +1,163 @@
+import atexit
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+from collections import OrderedDict
+from collections.abc import Iterator, Mapping
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Literal
+
+from agents.common.charts.types import ChartData, ChartRenderer
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _init_worker() -> None:
+    import matplotlib
+
+    matplotlib.use("Agg")
+
+
+def _render(chart: ChartData) -> bytes:
+    return ChartRenderer.to_png(chart)
+
+
+class ChartRenderService:
+    """
+    Render charts to PNG on a pool of processes, matplotlib being neither thread-safe
+    nor able to release the GIL. The pool is created on first use and kept for the
+    life of the process. PNGs are cached by a hash of the chart data, so an unchanged
+    chart is only rendered once. Rendering happens in the current process when it is
+    not allowed to start children (e.g. a daemonic Celery prefork worker).
+    """
+
+    def __init__(
+        self,
+        backend: Literal["process", "inline"] = settings.chart_render_backend,
+        max_workers: int | None = settings.chart_render_workers,
+        cache_size: int = settings.chart_render_cache_size,
+    ):
+        if backend == "process" and multiprocessing.current_process().daemon:
+            logger.warning(
+                "Daemonic processes cannot start a process pool, "
+                "charts are rendered in the current process."
+            )
+            backend = "inline"
+        self.max_workers = max_workers or min(4, os.cpu_count() or 1)
+        # With a single core the pool only adds the cost of pickling the charts
+        self.backend = backend if self.max_workers > 1 else "inline"
+        self.cache_size = cache_size
+        self._cache: OrderedDict[str, bytes] = OrderedDict()
+        self._lock = threading.Lock()
+        self._render_lock = threading.Lock()
+        self._executor: ProcessPoolExecutor | None = None
+
+    def render(self, charts: list[ChartData]) -> list[bytes]:
+        """Render charts to PNG, in the order of `charts`."""
+        keys = [self._key(chart) for chart in charts]
+        pngs: dict[str, bytes] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._cache:
+                    self._cache.move_to_end(key)
+                    pngs[key] = self._cache[key]
+
+        missing = {
+            key: chart
+            for key, chart in zip(keys, charts, strict=True)
+            if key not in pngs
+        }
+        rendered = self._render_all(list(missing.values()))
+        pngs.update(zip(missing, rendered, strict=True))
+
+        with self._lock:
+            for key, png in zip(missing, rendered, strict=True):
+                self._cache[key] = png
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return [pngs[key] for key in keys]
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def _render_all(self, charts: list[ChartData]) -> list[bytes]:
+        # A single chart is not worth a round trip to the pool
+        if self.backend == "inline" or len(charts) < 2:
+            return self._render_inline(charts)
+        try:
+            return list(self._get_executor().map(_render, charts))
+        except BrokenProcessPool:
+            logger.warning("Chart render pool broke, rendering in the current process")
+            self._executor = None
+            return self._render_inline(charts)
+
+    def _render_inline(self, charts: list[ChartData]) -> list[bytes]:
+        # pyplot keeps global state, tools running in parallel threads take turns
+        with self._render_lock:
+            return [_render(chart) for chart in charts]
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+            return self._executor
+
+    @staticmethod
+    def _key(chart: ChartData) -> str:
+        return hashlib.sha256(chart.model_dump_json().encode()).hexdigest()
+
+
+class PlotGroups(Mapping[str, dict[str, bytes]]):
+    """
+    PNG renders of chart groups (`{"<chart name>.png": png}` per group), rendered on
+    the first access to a group, so only the groups an interpreter reads are drawn.
+    """
+
+    def __init__(
+        self,
+        chart_groups: dict[str, dict[str, ChartData]],
+        renderer: ChartRenderService | None = None,
+    ):
+        self.chart_groups = chart_groups
+        self.renderer = renderer or get_chart_render_service()
+        self._rendered: dict[str, dict[str, bytes]] = {}
+
+    def __getitem__(self, group_name: str) -> dict[str, bytes]:
+        if group_name not in self._rendered:
+            charts = self.chart_groups[group_name]
+            pngs = self.renderer.render(list(charts.values()))
+            self._rendered[group_name] = {
+                f"{chart_name}.png": png
+                for chart_name, png in zip(charts, pngs, strict=True)
+            }
+        return self._rendered[group_name]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.chart_groups)
+
+    def __len__(self) -> int:
+        return len(self.chart_groups)
+
+
+_service: ChartRenderService | None = None
+_service_lock = threading.Lock()
+
+
+def get_chart_render_service() -> ChartRenderService:
+    """The render service of the current process."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ChartRenderService()
+            atexit.register(_service.shutdown)
+        return _service
@@ -0,0 +1,128 @@
+import ast
+from collections.abc import Iterable
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+CLIP_EMBEDDER = "open_clip||ViT-B-16||datacomp_xl_s13b_b90k"
+
+
+class EmbeddingStore:
+    """
+    Embeddings stored as the rows of one contiguous float32 matrix, with an id → row
+    index. Items are read as row views of the matrix, so no per-item copy is made.
+    """
+
+    def __init__(self, ids: list[str], vectors: np.ndarray):
+        if len(ids) != len(vectors):
+            raise ValueError("There must be exactly one vector per id")
+        self.vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        self.index = {item_id: row for row, item_id in enumerate(ids)}
+
+    @classmethod
+    def empty(cls) -> "EmbeddingStore":
+        return cls([], np.empty((0, 0), dtype=np.float32))
+
+    @classmethod
+    def from_points(
+        cls, points: list[dict[str, Any]], embedder: str = CLIP_EMBEDDER
+    ) -> "EmbeddingStore":
+        """Build a store from one list of visual search points, see `from_pages`."""
+        return cls.from_pages([points], embedder=embedder, capacity=len(points))
+
+    @classmethod
+    def from_pages(
+        cls,
+        pages: Iterable[list[dict[str, Any]]],
+        embedder: str = CLIP_EMBEDDER,
+        capacity: int = 0,
+    ) -> "EmbeddingStore":
+        """
+        Build a store from pages of visual search points
+        (`{"id": ..., "vector": {embedder: [...]}}`), writing each vector straight into
+        its row of a matrix preallocated for `capacity` rows, grown in place when full.
+        Points without a vector for `embedder` are skipped.
+        """
+        ids: list[str] = []
+        vectors: np.ndarray | None = None
+        for points in pages:
+            for point in points:
+                vector = point["vector"].get(embedder)
+                if vector is None:
+                    continue
+                if vectors is None:
+                    rows = max(capacity, len(points), 1)
+                    vectors = np.empty((rows, len(vector)), dtype=np.float32)
+                elif len(ids) == len(vectors):
+                    vectors.resize((2 * len(vectors), vectors.shape[1]), refcheck=False)
+                vectors[len(ids)] = vector
+                ids.append(str(point["id"]))
+        if vectors is None:
+            return cls.empty()
+        # Release the unused rows in place
+        vectors.resize((len(ids), vectors.shape[1]), refcheck=False)
+        return cls(ids, vectors)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, item_id: object) -> bool:
+        return item_id in self.index
+
+    def __getitem__(self, item_id: str) -> np.ndarray:
+        return self.vectors[self.index[item_id]]
+
+    def get(self, item_id: str, default: Any = None) -> np.ndarray | Any:
+        row = self.index.get(item_id)
+        return default if row is None else self.vectors[row]
+
+    @property
+    def ids(self) -> list[str]:
+        return list(self.index)
+
+
+def parse_embedding(value: Any) -> np.ndarray | None:
+    """
+    Read an embedding cell: an array, a list, or its text when the metadata was
+    loaded back from CSV. Returns None when there is no usable embedding.
+    """
+    if isinstance(value, str):
+        try:
+            value = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            return None
+    if not isinstance(value, list | tuple | np.ndarray) or len(value) == 0:
+        return None
+    return np.asarray(value, dtype=np.float32)
+
+
+def stack_embeddings(values: Iterable[Any]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Gather embedding cells into one float32 matrix. Returns the matrix of the valid
+    embeddings and a boolean mask of the cells they come from.
+    """
+    embeddings = [parse_embedding(value) for value in values]
+    mask = np.array([embedding is not None for embedding in embeddings], dtype=bool)
+    valid = [embedding for embedding in embeddings if embedding is not None]
+    if not valid:
+        return np.empty((0, 0), dtype=np.float32), mask
+    return np.stack(valid), mask
+
+
+def embeddings_to_lists(df: pd.DataFrame) -> pd.DataFrame:
+    """Convert array cells to lists, so that text formats (CSV) can read them back."""
+    array_columns = [
+        column
+        for column in df.columns
+        if df[column].dtype == object
+        and df[column].map(lambda value: isinstance(value, np.ndarray)).any()
+    ]
+    if not array_columns:
+        return df
+    df = df.copy()
+    for column in array_columns:
+        df[column] = df[column].map(
+            lambda value: value.tolist() if isinstance(value, np.ndarray) else value
+        )
+    return df
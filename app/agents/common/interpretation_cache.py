@@ -0,0 +1,84 @@
+import hashlib
+import json
+import logging
+from collections.abc import Sequence
+from typing import Any
+
+from pydantic import TypeAdapter
+from pydantic_ai import Agent, BinaryContent
+from pydantic_ai.messages import UserContent
+
+from config.settings import settings
+from services.redis_config import redis_client as cache
+
+logger = logging.getLogger(__name__)
+
+
+class InterpretationCache:
+    """
+    Cache of LLM interpretations, keyed by the model, a hash of the agent's prompts
+    and output type, and a hash of the user prompt (text and chart PNG bytes). Any
+    change to the data, the prompt or the model is a miss, so a re-run only pays for
+    the sections whose inputs changed. Cache errors are logged and treated as misses.
+    """
+
+    VERSION = 1
+
+    def __init__(
+        self,
+        enabled: bool = settings.llm_interpretation_cache,
+        ttl: int = settings.llm_interpretation_cache_ttl,
+    ):
+        self.enabled = enabled
+        self.ttl = ttl
+
+    def key(
+        self, agent: Agent[Any, Any], user_prompt: str | Sequence[UserContent]
+    ) -> str:
+        model = agent.model
+        model_name = getattr(model, "model_name", model)
+        system = getattr(model, "system", "")
+
+        prompt_hash = hashlib.sha256()
+        for system_prompt in agent._system_prompts:
+            prompt_hash.update(system_prompt.encode())
+        schema = TypeAdapter(agent.result_type).json_schema()
+        prompt_hash.update(json.dumps(schema, sort_keys=True).encode())
+
+        content_hash = hashlib.sha256()
+        parts = [user_prompt] if isinstance(user_prompt, str) else user_prompt
+        for part in parts:
+            if isinstance(part, str):
+                content_hash.update(b"text:" + part.encode())
+            elif isinstance(part, BinaryContent):
+                content_hash.update(f"{part.media_type}:".encode() + part.data)
+            else:
+                content_hash.update(repr(part).encode())
+            content_hash.update(b"\0")
+
+        return (
+            f"llm_interpretation:v{self.VERSION}:{system}:{model_name}:"
+            f"{prompt_hash.hexdigest()[:16]}:{content_hash.hexdigest()}"
+        )
+
+    def lookup(self, key: str, result_type: Any) -> tuple[bool, Any]:
+        """Returns whether `key` was found, and the cached output."""
+        if not self.enabled:
+            return False, None
+        try:
+            value = cache.get(key)
+            if value is None:
+                return False, None
+            return True, TypeAdapter(result_type).validate_json(value)
+        except Exception:
+            logger.warning("Could not read the interpretation cache", exc_info=True)
+            return False, None
+
+    def store(self, key: str, result_type: Any, output: Any) -> None:
+        if not self.enabled:
+            return
+        try:
+            value = TypeAdapter(result_type).dump_json(output)
+            cache.set(key, value, ex=self.ttl)
+        except Exception:
+            logger.warning("Could not write the interpretation cache", exc_info=True)
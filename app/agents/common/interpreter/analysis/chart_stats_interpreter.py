@@ -10,6 +10,7 @@ from agents.common.charts.types import BoxPlotChart, ChartData, HistogramChart
 from agents.common.interpreter.analysis.base_group_interpreter import (
     BaseGroupInterpreter,
 )
+from agents.common.llm_runner import run_agent
 from agents.common.models.contents import ReportContent
 from agents.common.stats.analysis.base_chart_stats import BaseChartStats
 
@@ -42,7 +43,7 @@ class ChartStatsInterpreter(BaseGroupInterpreter[T, ReportContent]):
                 if effective_prompt
                 else [BinaryContent(image, media_type="image/png")]
             )
-            result = self.agent.run_sync(input_payload)
+            result = run_agent(self.agent, input_payload)
             insight = result.data
             results.append((chart_name, chart, insight))
 
@@ -11,6 +11,7 @@ from agents.common.charts.types import BarChart, BoxPlotChart, ChartData, Histog
 from agents.common.interpreter.analysis.base_group_interpreter import (
     BaseGroupInterpreter,
 )
+from agents.common.llm_runner import run_agent
 from agents.common.models.contents import ReportContent, ReportError
 from agents.common.stats.analysis.base_chart_stats import BaseChartStats
 
@@ -41,7 +42,7 @@ class MultiChartStatsInterpreter(BaseGroupInterpreter[T, ReportContent]):
         effective_prompt = prompt or self.prompt
         input_payload = [effective_prompt] + images if effective_prompt else images
 
-        result = self.agent.run_sync(input_payload)
+        result = run_agent(self.agent, input_payload)
         insight = result.data.strip()
         return insight, charts
 
@@ -0,0 +1,63 @@
+import asyncio
+import threading
+from collections.abc import Sequence
+from dataclasses import dataclass
+from typing import Any, Generic, TypeVar
+
+from pydantic_ai import Agent
+from pydantic_ai.agent import AgentRunResult
+from pydantic_ai.messages import UserContent
+
+from agents.common.interpretation_cache import InterpretationCache
+from config.settings import settings
+
+T = TypeVar("T")
+
+_loop: asyncio.AbstractEventLoop | None = None
+_loop_lock = threading.Lock()
+
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Event loop of the process running all LLM calls, started on first use."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(
+                target=_loop.run_forever, name="llm-loop", daemon=True
+            ).start()
+        return _loop
+
+
+@dataclass(frozen=True)
+class CachedRunResult(Generic[T]):
+    """Stands in for the `AgentRunResult` of a run answered by the cache."""
+
+    data: T
+
+
+def run_agent(
+    agent: Agent[Any, Any],
+    user_prompt: str | Sequence[UserContent],
+    use_cache: bool = True,
+) -> AgentRunResult[Any] | CachedRunResult[Any]:
+    """
+    Run an agent from synchronous code, like `Agent.run_sync`, on one event loop
+    shared by the whole process. Tools running in parallel threads then wait on
+    their LLM calls concurrently, and the cached HTTP client of the provider is
+    only ever used from that loop.
+
+    The output of an identical run (same model, prompts and data) is read from the
+    interpretation cache, unless `use_cache` is False.
+    """
+    cache = InterpretationCache(enabled=use_cache and settings.llm_interpretation_cache)
+    key = cache.key(agent, user_prompt) if cache.enabled else ""
+    found, output = cache.lookup(key, agent.result_type)
+    if found:
+        return CachedRunResult(output)
+
+    result = asyncio.run_coroutine_threadsafe(
+        agent.run(user_prompt), _get_loop()
+    ).result()
+    cache.store(key, agent.result_type, result.data)
+    return result
@@ -1,11 +1,13 @@
 import logging
+from collections import defaultdict
 from concurrent.futures.thread import ThreadPoolExecutor
 
 import pandas as pd
-from picsellia import DatasetVersion, Job
+from picsellia import Annotation, DatasetVersion, Job
 from picsellia.exceptions import (
     BadRequestError,
     InternalServerError,
+    NoDataError,
     WaitingAttemptsTimeout,
 )
 from tqdm import tqdm
@@ -14,6 +16,7 @@ from agents.annotation_agent.common.annotation_clip_embedder import (
     AnnotationCLIPEmbedder,
 )
 from agents.annotation_agent.common.embeddings import load_all_shapes_and_vectors
+from agents.common.embedding_store import EmbeddingStore
 from agents.common.metadata.asset_metadata import AssetMetadata
 from agents.common.metadata.error_content import get_error_content
 from agents.common.models.contents import ReportError
@@ -30,21 +33,21 @@ class AnnotationMetadataProcessor:
         context_service: ContextService,
         dataset_version: DatasetVersion,
         image_metadata: pd.DataFrame,
+        previous_metadata: pd.DataFrame | None = None,
     ):
         self.dataset_version = dataset_version
         self.context_service = context_service
         self.image_metadata = image_metadata
+        self.previous_metadata = previous_metadata
         self.embedder = AnnotationCLIPEmbedder(self.dataset_version.type)
-        self.embeddings_map: dict[str, list] = {}
+        self.embeddings_map = EmbeddingStore.empty()
 
     def process(self):
         """Process annotation metadata for all assets in the dataset_version."""
         try:
             try:
                 self._get_shape_embeddings_count()
-                self.embeddings_map = load_all_shapes_and_vectors(
-                    self.dataset_version, 10000
-                )
+                self.embeddings_map = load_all_shapes_and_vectors(self.dataset_version)
             except (WaitingAttemptsTimeout, BadRequestError):
                 message = (
                     "Your embeddings are not ready yet, "
@@ -65,7 +68,7 @@ class AnnotationMetadataProcessor:
                 target_path = row.iloc[0]["target_path"]
                 asset_metadata.target_path = target_path
                 assets_to_process.append(asset_metadata)
-            data = []
+            data, assets_to_process = self._reuse_previous_rows(assets_to_process)
             with ThreadPoolExecutor() as executor:
                 results = executor.map(
                     self._process_annotation_metadata, assets_to_process
@@ -85,6 +88,114 @@ class AnnotationMetadataProcessor:
             df = pd.DataFrame()
         return df
 
+    def _reuse_previous_rows(
+        self, assets_to_process: list[AssetMetadata]
+    ) -> tuple[list[dict], list[AssetMetadata]]:
+        """
+        In incremental mode, keep the rows of the previous analysis for assets whose
+        annotation is unchanged and return the assets that still need to be processed.
+        An annotation is unchanged when it has the same id and exactly the same shapes,
+        with the same labels and geometry, on an image of the same size; shape embeddings are always taken from the fresh embeddings map, so nothing is
+        reused without one.
+        """
+        previous = self.previous_metadata
+        if previous is None or previous.empty or "annotation_id" not in previous:
+            return [], assets_to_process
+        if not self.embeddings_map:
+            logger.info("No shape embeddings, reprocessing every asset")
+            return [], assets_to_process
+
+        try:
+            annotations = self._list_annotations()
+        except NoDataError:
+            return [], []
+
+        previous_rows = dict(
+            list(previous.groupby(previous["asset_id"].astype(str), sort=False))
+        )
+        assets_to_process = [
+            asset_metadata
+            for asset_metadata in assets_to_process
+            if annotations[asset_metadata.id]
+        ]
+        # Shapes are not listed with the annotations, one request per annotation
+        with ThreadPoolExecutor() as executor:
+            unchanged = executor.map(
+                lambda asset_metadata: self._is_unchanged(
+                    asset_metadata,
+                    previous_rows.get(asset_metadata.id),
+                    annotations[asset_metadata.id],
+                ),
+                assets_to_process,
+            )
+            data: list[dict] = []
+            changed_assets = []
+            for asset_metadata, is_unchanged in zip(
+                assets_to_process, unchanged, strict=True
+            ):
+                if not is_unchanged:
+                    changed_assets.append(asset_metadata)
+                    continue
+                for entry in previous_rows[asset_metadata.id].to_dict("records"):
+                    entry["shape_embeddings"] = self.embeddings_map.get(
+                        str(entry["shape_id"])
+                    )
+                    data.append(entry)
+
+        logger.info(
+            f"Reusing previous annotation metadata for "
+            f"{len(assets_to_process) - len(changed_assets)}/{len(assets_to_process)} assets"
+        )
+        return data, changed_assets
+
+    def _list_annotations(self) -> dict[str, dict[str, Annotation]]:
+        """Annotations of the dataset version by asset id, then by annotation id."""
+        annotations: dict[str, dict[str, Annotation]] = defaultdict(dict)
+        for annotation in self.dataset_version.list_annotations():
+            annotations[str(annotation.asset_id)][str(annotation.id)] = annotation
+        return annotations
+
+    def _is_unchanged(
+        self,
+        asset_metadata: AssetMetadata,
+        rows: pd.DataFrame | None,
+        annotations: dict[str, Annotation],
+    ) -> bool:
+        """Whether the previous rows hold exactly the current shapes of annotations."""
+        if rows is None:
+            return False
+        if not (
+            (rows["image_width"] == asset_metadata.width).all()
+            and (rows["image_height"] == asset_metadata.height).all()
+        ):
+            return False
+        processor = self.embedder.annotation_processor
+        for annotation_id, annotation_rows in rows.groupby(
+            rows["annotation_id"].astype(str)
+        ):
+            if annotation_id not in annotations:
+                return False
+            shapes = processor.list_shapes(annotations[annotation_id])
+            previous_shapes = {
+                str(row["shape_id"]): row for row in annotation_rows.to_dict("records")
+            }
+            if previous_shapes.keys() != shapes.keys():
+                return False
+            for shape_id, shape in shapes.items():
+                if not self._is_same_shape(previous_shapes[shape_id], shape):
+                    return False
+        return True
+
+    def _is_same_shape(self, row: dict, shape: dict) -> bool:
+        """Whether a previous row has the label and geometry of a current shape."""
+        if str(row["label"]) != str(shape["label"]):
+            return False
+        if str(row["label_id"]) != str(shape["label_id"]):
+            return False
+        return all(
+            row.get(key) == shape[key] for key in ("x", "y", "w", "h") if key in shape
+        )
+
     def compute_image_embeddings(self):
         resp = self.dataset_version.get_shapes_embeddings_status()
         if resp["success_count"] > int(resp["data_count"] / 2):
@@ -2,8 +2,13 @@ import logging
 import os
 import shutil
 import uuid
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import Future
 from concurrent.futures.thread import ThreadPoolExecutor
+from itertools import batched
 
+import numpy as np
 import pandas as pd
 from picsellia import DatasetVersion
 from picsellia.exceptions import (
@@ -11,16 +16,19 @@ from picsellia.exceptions import (
     InternalServerError,
     WaitingAttemptsTimeout,
 )
+from picsellia.sdk.asset import Asset, MultiAsset
 from tqdm import tqdm
 
 from agents.common.metadata.asset_metadata import AssetMetadata
 from agents.common.metadata.error_content import get_error_content
 from agents.common.models.contents import ReportError
-from agents.common.picsellia.list_assets import load_assets
+from agents.common.picsellia.list_assets import iter_asset_batches
+from agents.image_agent.common.asset_captioning import AssetCaptioning
 from agents.image_agent.common.embeddings import load_all_assets_and_vectors
-from agents.image_agent.common.image_blurriness_compute import (
-    assess_bluriness_and_corruption,
-)
+from agents.image_agent.common.image_blurriness_compute import ImageQualityMetrics
+from agents.image_agent.common.image_metrics_cache import ImageMetricsCache
+from agents.image_agent.common.image_metrics_executor import ImageMetricsExecutor
+from config.settings import settings
 from services.context import ContextService
 from services.report_enums import SectionName
 
@@ -28,22 +36,51 @@ logger = logging.getLogger(__name__)
 
 
 class ImageMetadataProcessor:
+    METRIC_COLUMNS = (
+        "is_blurry",
+        "is_corrupted",
+        "blur_score",
+        "width",
+        "height",
+        "file_size_bytes",
+        "color",
+        "luminance",
+        "contrast",
+    )
+
     def __init__(
-        self, context_service: ContextService, dataset_version: DatasetVersion
+        self,
+        context_service: ContextService,
+        dataset_version: DatasetVersion,
+        streaming: bool = settings.image_metadata_streaming,
+        window_size: int = settings.image_metadata_window_size,
+        prefetch_windows: int = settings.image_metadata_prefetch_windows,
+        previous_metadata: pd.DataFrame | None = None,
+        captioning: bool = settings.image_captioning,
     ):
         self.context_service = context_service
         self.dataset_version = dataset_version
+        self.streaming = streaming
+        self.window_size = max(1, window_size)
+        self.prefetch_windows = max(1, prefetch_windows)
+        self.metrics_cache = ImageMetricsCache()
+        self.previous_metadata = previous_metadata
+        self.captioning = captioning
+        # Captions of the streamed windows, by asset id, made before their removal
+        self._window_captions: dict[str, str | None] = {}
 
     def process(self):
         """Processes image metadata for all assets in the dataset version."""
         target_path = f"{uuid.uuid4()}"
-        self.dataset_version.download(target_path)
+        self._window_captions = {}
+        if not self.streaming:
+            self.dataset_version.download(target_path)
         try:
-            assets = load_assets(self.dataset_version)
+            batches = iter_asset_batches(self.dataset_version)
             try:
                 count = self._get_dataset_version_count()
-                assets = load_all_assets_and_vectors(
-                    assets=assets, dataset_version=self.dataset_version, count=count
+                batches = load_all_assets_and_vectors(
+                    batches=batches, dataset_version=self.dataset_version, count=count
                 )
             except (WaitingAttemptsTimeout, BadRequestError):
                 message = (
@@ -57,21 +94,10 @@ class ImageMetadataProcessor:
                 )
                 self.context_service.sync_content(content)
 
-            # Prepare assets for processing
-            assets_to_process = []
-            for asset in assets:
-                asset_obj = AssetMetadata(asset)
-                asset_obj.target_path = os.path.join(target_path, asset.filename)
-                assets_to_process.append(asset_obj)
-
-            with ThreadPoolExecutor() as executor:
-                data = list(
-                    tqdm(
-                        executor.map(self._process_asset_metadata, assets_to_process),
-                        total=len(assets_to_process),
-                        desc="Processing assets",
-                    )
-                )
+            assets_to_process, metrics = self._process_with_cache(batches, target_path)
+            df = self._build_dataframe(assets_to_process, metrics)
+            if self.captioning:
+                df["caption"] = self._caption(assets_to_process, target_path)
 
         except Exception:
             logger.exception("Error during parallel processing")
@@ -84,7 +110,244 @@ class ImageMetadataProcessor:
 
         finally:
             shutil.rmtree(target_path, ignore_errors=True)
-        return pd.DataFrame(data)
+        return df
+
+    def _process_with_cache(
+        self, batches: Iterable[list[Asset]], target_path: str
+    ) -> tuple[list[AssetMetadata], ImageQualityMetrics]:
+        """
+        Reuse the metrics of the previous analysis (incremental mode) and the cached
+        metrics of images already scored in another dataset version, and only download
+        and score the remaining ones. Batches are looked up as they are listed, so the
+        first images are scored while the rest of the version is still being listed.
+        Assets keep their original order.
+        """
+        previous = self._index_previous_metrics()
+        assets: list[Asset] = []
+        known: list[tuple[np.ndarray, ImageQualityMetrics]] = []
+        misses: list[int] = []
+        miss_data_ids: list[str] = []
+        reused_count = cached_count = 0
+
+        def iter_assets_to_score() -> Iterator[Asset]:
+            nonlocal reused_count, cached_count
+            for batch in batches:
+                offset = len(assets)
+                assets.extend(batch)
+                pending = np.arange(len(batch))
+                if previous is not None:
+                    reused, reused_metrics = self._lookup_previous_metrics(
+                        batch, previous
+                    )
+                    known.append((offset + np.flatnonzero(reused), reused_metrics))
+                    pending = np.flatnonzero(~reused)
+                    reused_count += int(reused.sum())
+
+                hits, cached_metrics = self.metrics_cache.lookup(
+                    [str(batch[index].data_id) for index in pending]
+                )
+                known.append((offset + pending[hits], cached_metrics))
+                cached_count += int(hits.sum())
+                for index in pending[~hits]:
+                    misses.append(offset + int(index))
+                    miss_data_ids.append(str(batch[index].data_id))
+                    yield batch[index]
+
+        if self.streaming:
+            scored_assets, scored_metrics = self._process_streaming(
+                iter_assets_to_score(), target_path
+            )
+        else:
+            scored_assets, scored_metrics = self._process_downloaded(
+                list(iter_assets_to_score()), target_path
+            )
+        if self.previous_metadata is not None:
+            logger.info(
+                f"Reused previous image metrics for {reused_count}/{len(assets)} assets"
+            )
+        logger.info(
+            f"Reused cached image metrics for {cached_count}/"
+            f"{len(assets) - reused_count} assets"
+        )
+        self.metrics_cache.store(miss_data_ids, scored_metrics)
+
+        metrics = ImageQualityMetrics.empty(len(assets))
+        for indices, batch_metrics in known:
+            metrics.assign(indices, batch_metrics)
+        metrics.assign(np.array(misses, dtype=np.int64), scored_metrics)
+
+        scored = dict(zip(misses, scored_assets, strict=True))
+        assets_to_process = [
+            scored[index] if index in scored else AssetMetadata(asset)
+            for index, asset in enumerate(assets)
+        ]
+        return assets_to_process, metrics
+
+    def _index_previous_metrics(self) -> pd.DataFrame | None:
+        """The previous analysis indexed by asset id, None when it has no metrics."""
+        previous = self.previous_metadata
+        if previous is None or not set(self.METRIC_COLUMNS) <= set(previous.columns):
+            return None
+        return (
+            previous.assign(asset_id=previous["asset_id"].astype(str))
+            .drop_duplicates("asset_id")
+            .set_index("asset_id")
+        )
+
+    def _lookup_previous_metrics(
+        self, assets: list[Asset], previous: pd.DataFrame
+    ) -> tuple[np.ndarray, ImageQualityMetrics]:
+        """
+        Read back the metrics of assets that were already part of the previous analysis.
+        An asset always points to the same data, so its metrics are still valid; images
+        that were corrupted are scored again in case it came from a failed download.
+        """
+        rows = previous.reindex([str(asset.id) for asset in assets])
+        colors = rows["color"].map(self._parse_color)
+        reused = (
+            rows["is_corrupted"].eq(False)
+            & colors.notna()
+            & rows[["blur_score", "width", "height", "file_size_bytes"]]
+            .notna()
+            .all(axis=1)
+        ).to_numpy()
+
+        rows, colors = rows[reused], colors[reused]
+        metrics = ImageQualityMetrics.empty(len(rows))
+        metrics.is_blurry[:] = rows["is_blurry"].astype(bool)
+        metrics.blur_score[:] = rows["blur_score"].astype(float)
+        metrics.width[:] = rows["width"].astype(np.int64)
+        metrics.height[:] = rows["height"].astype(np.int64)
+        metrics.file_size_bytes[:] = rows["file_size_bytes"].astype(np.int64)
+        metrics.luminance[:] = rows["luminance"].astype(float)
+        metrics.contrast[:] = rows["contrast"].astype(float)
+        for i, color in enumerate(colors):
+            metrics.color[i, : len(color)] = color
+        return reused, metrics
+
+    @staticmethod
+    def _parse_color(value) -> np.ndarray | None:
+        """Parse a color stored as an array or as its CSV text, e.g. "[127.2 128.7 126.4]"."""
+        if isinstance(value, str):
+            try:
+                value = [float(v) for v in value.strip("[]").replace(",", " ").split()]
+            except ValueError:
+                return None
+        if not isinstance(value, list | tuple | np.ndarray):
+            return None
+        color = np.asarray(value, dtype=np.float64)[:4]
+        return color if color.size else None
+
+    def _process_downloaded(
+        self, assets: list[Asset], target_path: str
+    ) -> tuple[list[AssetMetadata], ImageQualityMetrics]:
+        """Score assets of a dataset version that was fully downloaded beforehand."""
+        assets_to_process = []
+        for asset in assets:
+            asset_obj = AssetMetadata(asset)
+            asset_obj.target_path = os.path.join(target_path, asset.filename)
+            assets_to_process.append(asset_obj)
+
+        with ImageMetricsExecutor() as executor:
+            metrics = executor.score(
+                [asset_obj.target_path for asset_obj in assets_to_process]
+            )
+        return assets_to_process, metrics
+
+    def _process_streaming(
+        self, assets: Iterable[Asset], target_path: str
+    ) -> tuple[list[AssetMetadata], ImageQualityMetrics]:
+        """
+        Download assets window by window and score (and caption) each window while the
+        next ones are being downloaded. A window directory is removed as soon as it has
+        been scored, so at most `prefetch_windows + 1` windows are on disk at once.
+        """
+        assets_to_process: list[AssetMetadata] = []
+        batches: list[ImageQualityMetrics] = []
+        pending: deque[Future[tuple[str, list[AssetMetadata]]]] = deque()
+        captioning = AssetCaptioning() if self.captioning else None
+
+        def score_next_window() -> None:
+            window_path, window_assets = pending.popleft().result()
+            try:
+                batches.append(
+                    executor.score([asset.target_path for asset in window_assets])
+                )
+                if captioning is not None:
+                    captions = captioning.caption_assets(
+                        [asset.asset for asset in window_assets],
+                        [asset.target_path for asset in window_assets],
+                    )
+                    self._window_captions.update(
+                        zip(
+                            [asset.id for asset in window_assets],
+                            captions,
+                            strict=True,
+                        )
+                    )
+            finally:
+                shutil.rmtree(window_path, ignore_errors=True)
+            assets_to_process.extend(window_assets)
+            progress.update(len(window_assets))
+
+        with (
+            ThreadPoolExecutor(max_workers=self.prefetch_windows) as downloader,
+            ImageMetricsExecutor() as executor,
+            tqdm(desc="Processing assets") as progress,
+        ):
+            for window_index, window in enumerate(self._split_in_windows(assets)):
+                window_path = os.path.join(target_path, str(window_index))
+                pending.append(
+                    downloader.submit(self._download_window, window, window_path)
+                )
+                if len(pending) > self.prefetch_windows:
+                    score_next_window()
+
+            while pending:
+                score_next_window()
+        return assets_to_process, ImageQualityMetrics.concatenate(batches)
+
+    def _caption(
+        self, assets_to_process: list[AssetMetadata], target_path: str
+    ) -> list[str | None]:
+        """
+        Caption every asset, reading the images from the downloaded version when there
+        is one. Streamed assets were captioned with their window, only the assets that
+        were not downloaded (metrics reused or cached) are fetched from their URL.
+        """
+        missing = [
+            asset_obj.asset
+            for asset_obj in assets_to_process
+            if asset_obj.id not in self._window_captions
+        ]
+        paths = [
+            None if self.streaming else os.path.join(target_path, asset.filename)
+            for asset in missing
+        ]
+        if missing:
+            logger.info(f"Captioning {len(missing)} images...")
+            captions = AssetCaptioning().caption_assets(missing, paths)
+            self._window_captions.update(
+                zip([str(asset.id) for asset in missing], captions, strict=True)
+            )
+        return [self._window_captions[asset_obj.id] for asset_obj in assets_to_process]
+
+    def _split_in_windows(self, assets: Iterable[Asset]) -> Iterator[list[Asset]]:
+        for window in batched(assets, self.window_size):
+            yield list(window)
+
+    def _download_window(
+        self, window: list[Asset], window_path: str
+    ) -> tuple[str, list[AssetMetadata]]:
+        MultiAsset(
+            self.dataset_version.connexion, self.dataset_version.id, window
+        ).download(window_path)
+        assets_to_process = []
+        for asset in window:
+            asset_obj = AssetMetadata(asset)
+            asset_obj.target_path = os.path.join(window_path, asset.filename)
+            assets_to_process.append(asset_obj)
+        return window_path, assets_to_process
 
     def compute_image_embeddings(self):
         try:
@@ -109,38 +372,14 @@ class ImageMetadataProcessor:
             return self.dataset_version.count_embeddings()
 
     @staticmethod
-    def _process_asset_metadata(asset_metadata: AssetMetadata):
-        """Process metadata related to the image."""
-        try:
-            (
-                is_blurry,
-                is_corrupted,
-                blur_score,
-                width,
-                height,
-                file_size_bytes,
-                avg_color,
-                luminance_value,
-                contrast,
-            ) = assess_bluriness_and_corruption(
-                filename=asset_metadata.target_path, blur_threshold=90.0
-            )
-
-            return {
-                **asset_metadata.get_metadata(),
-                "caption": "",
-                "is_blurry": is_blurry,
-                "is_corrupted": is_corrupted,
-                "blur_score": blur_score,
-                "width": width,
-                "height": height,
-                "file_size_bytes": file_size_bytes,
-                "color": avg_color,
-                "luminance": luminance_value,
-                "contrast": contrast,
-            }
-        except Exception as e:
-            logger.error(
-                f"Error processing asset {asset_metadata.asset.filename}: {str(e)}"
-            )
-            raise
+    def _build_dataframe(
+        assets_to_process: list[AssetMetadata], metrics: ImageQualityMetrics
+    ) -> pd.DataFrame:
+        """Assemble the image metadata DataFrame from asset metadata and metric arrays."""
+        df = pd.DataFrame(
+            [asset_metadata.get_metadata() for asset_metadata in assets_to_process]
+        )
+        df["caption"] = ""
+        for column, values in metrics.to_columns().items():
+            df[column] = values
+        return df
@@ -1,20 +1,35 @@
-import math
+from collections import deque
+from collections.abc import Generator, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
 from uuid import UUID
 
+import requests
 from picsellia import DatasetVersion, Tag
+from picsellia.decorators import retry
+from picsellia.exceptions import BadGatewayError, TooManyRequestError
 from picsellia.sdk.asset import Asset, MultiAsset
+from requests.adapters import HTTPAdapter
 
+from config.settings import settings
 
+# Rate limiting and gateway errors are transient, connection errors are already
+# retried by the SDK connexion itself
+RETRIED_ERRORS = (TooManyRequestError, BadGatewayError, requests.Timeout)
+
+
+@retry(RETRIED_ERRORS, total_tries=5, initial_wait=1.0)
 def list_paginated_ids(
     dataset_version: DatasetVersion, offset: int, limit: int
 ) -> tuple[list[UUID], int]:
     r = dataset_version.connexion.get(
         f"/api/dataset/version/{dataset_version.id}/assets/ids/paginated",
-        params={"limit": 200, "offset": offset},
+        params={"limit": limit, "offset": offset},
     ).json()
     return r["items"], r["count"]
 
 
+@retry(RETRIED_ERRORS, total_tries=5, initial_wait=1.0)
 def list_preview_assets_from_ids(
     dataset_version: DatasetVersion, ids: list[UUID]
 ) -> list[Asset]:
@@ -34,21 +49,89 @@ def list_preview_assets_from_ids(
     return assets
 
 
+def _ensure_connection_pool(dataset_version: DatasetVersion, size: int) -> None:
+    """Keep one pooled connection per worker instead of the default 10 per host."""
+    session = dataset_version.connexion.session
+    adapter = session.get_adapter(dataset_version.connexion.host)
+    if getattr(adapter, "_pool_maxsize", 0) < size:
+        session.mount(
+            dataset_version.connexion.host,
+            HTTPAdapter(pool_connections=1, pool_maxsize=size),
+        )
+
+
+def _iter_id_batches(
+    dataset_version: DatasetVersion,
+    executor: ThreadPoolExecutor,
+    max_pages: int,
+    page_size: int,
+    batch_size: int,
+) -> Generator[list[UUID], None, None]:
+    """Yield the asset ids batch by batch, listing at most `max_pages` pages ahead."""
+    page_ids, count = list_paginated_ids(dataset_version, 0, page_size)
+    offsets = iter(range(page_size, count, page_size))
+    pages: deque[Future[tuple[list[UUID], int]]] = deque()
+    try:
+        while True:
+            for offset in islice(offsets, max_pages - len(pages)):
+                pages.append(
+                    executor.submit(
+                        list_paginated_ids, dataset_version, offset, page_size
+                    )
+                )
+            for start in range(0, len(page_ids), batch_size):
+                yield page_ids[start : start + batch_size]
+            if not pages:
+                return
+            page_ids, _ = pages.popleft().result()
+    finally:
+        for future in pages:
+            future.cancel()
+
+
+def iter_asset_batches(
+    dataset_version: DatasetVersion,
+    max_workers: int = settings.list_assets_workers,
+    page_size: int = 200,
+    batch_size: int = 50,
+) -> Iterator[list[Asset]]:
+    """
+    Yield the assets of a dataset version batch by batch, in the order of the version.
+    Asset previews are fetched on a pool of `max_workers` threads, at most
+    `2 * max_workers` previews ahead of the consumer, and id pages on a pool of their
+    own, at most `max_workers` pages ahead, so the first batches are available while
+    the rest of the version is still being listed.
+    """
+    max_workers = max(1, max_workers)
+    _ensure_connection_pool(dataset_version, 2 * max_workers)
+
+    with (
+        ThreadPoolExecutor(max_workers=max_workers) as executor,
+        ThreadPoolExecutor(max_workers=max_workers) as page_executor,
+    ):
+        id_batches = _iter_id_batches(
+            dataset_version, page_executor, max_workers, page_size, batch_size
+        )
+        previews: deque[Future[list[Asset]]] = deque()
+        try:
+            for batch_ids in id_batches:
+                previews.append(
+                    executor.submit(
+                        list_preview_assets_from_ids, dataset_version, batch_ids
+                    )
+                )
+                if len(previews) >= 2 * max_workers:
+                    yield previews.popleft().result()
+            while previews:
+                yield previews.popleft().result()
+        finally:
+            id_batches.close()
+            for future in previews:
+                future.cancel()
+
+
 def load_assets(dataset_version: DatasetVersion) -> MultiAsset:
     items = []
-    offset = 0
-    count = 1
-    limit = 200
-    ids = []
-    while offset < count:
-        page_ids, count = list_paginated_ids(dataset_version, offset, limit)
-        ids.extend(page_ids)
-        offset += limit
-
-    batch_size = 50
-    batch_count = math.ceil(len(ids) / batch_size)
-    for batch in range(batch_count):
-        batch_ids = ids[batch_size * batch : batch_size * (batch + 1)]
-        items.extend(list_preview_assets_from_ids(dataset_version, batch_ids))
-
+    for batch in iter_asset_batches(dataset_version):
+        items.extend(batch)
     return MultiAsset(dataset_version.connexion, dataset_version.id, items)
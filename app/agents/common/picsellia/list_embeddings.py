@@ -0,0 +1,90 @@
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from picsellia import DatasetVersion
+from picsellia.decorators import retry
+from picsellia.services.visual_search import (
+    DatasetVersionVisualSearchService,
+    RectangleVisualSearchService,
+    VisualSearchService,
+)
+from tqdm import tqdm
+
+from agents.common.embedding_store import EmbeddingStore
+from agents.common.picsellia.list_assets import RETRIED_ERRORS
+from config.settings import settings
+
+
+@retry(RETRIED_ERRORS, total_tries=5, initial_wait=1.0)
+def list_embeddings_page(
+    service: VisualSearchService, offset: str | None, page_size: int
+) -> tuple[list[dict], str | None]:
+    r = service.connexion.get(
+        service.build_url_list(),
+        params={
+            "with_vector": True,
+            "with_payload": False,
+            "has_error": False,
+            "limit": page_size,
+            "offset": offset,
+            **service.get_additional_scroll_params(),
+        },
+    ).json()
+    return r["points"], r["next_page_offset"]
+
+
+def iter_embedding_pages(
+    service: VisualSearchService, page_size: int = settings.embeddings_page_size
+) -> Iterator[list[dict]]:
+    """
+    Scroll through all the embeddings of a visual search collection. Pages are chained
+    by a cursor, so the next page is requested while the current one is consumed.
+    """
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        next_page: Future | None = executor.submit(
+            list_embeddings_page, service, None, page_size
+        )
+        while next_page is not None:
+            points, offset = next_page.result()
+            next_page = None
+            if offset is not None:
+                next_page = executor.submit(
+                    list_embeddings_page, service, offset, page_size
+                )
+            yield points
+
+
+def load_embedding_store(
+    service: VisualSearchService, count: int | None = None, desc: str = "Embeddings"
+) -> EmbeddingStore:
+    """Load every embedding of a collection, `count` is only used to preallocate."""
+    with tqdm(total=count, desc=f"Loading {desc.lower()}") as progress:
+
+        def pages() -> Iterator[list[dict]]:
+            for points in iter_embedding_pages(service):
+                yield points
+                progress.update(len(points))
+
+        return EmbeddingStore.from_pages(pages(), capacity=count or 0)
+
+
+def load_image_embeddings(
+    dataset_version: DatasetVersion, count: int | None = None
+) -> EmbeddingStore:
+    return load_embedding_store(
+        DatasetVersionVisualSearchService(
+            dataset_version.connexion, dataset_version.id
+        ),
+        count=count,
+        desc="Image embeddings",
+    )
+
+
+def load_rectangle_embeddings(
+    dataset_version: DatasetVersion, count: int | None = None
+) -> EmbeddingStore:
+    return load_embedding_store(
+        RectangleVisualSearchService(dataset_version.connexion, dataset_version.id),
+        count=count,
+        desc="Shape embeddings",
+    )
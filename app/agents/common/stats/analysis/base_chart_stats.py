@@ -1,9 +1,11 @@
 from abc import ABC, abstractmethod
+from collections.abc import Mapping
 from typing import TypeVar
 
 import pandas as pd
 
-from agents.common.charts.types import ChartData, ChartRenderer
+from agents.common.charts.render_service import PlotGroups
+from agents.common.charts.types import ChartData
 from agents.common.stats.analysis.base_stats import BaseStats
 
 T = TypeVar("T", bound="BaseChartStats")
@@ -14,7 +16,7 @@ class BaseChartStats(BaseStats[T], ABC):
         super().__init__(df)
 
         self.chart_groups: dict[str, dict[str, ChartData]] = {}
-        self.plot_groups: dict[str, dict[str, bytes]] = {}
+        self.plot_groups: Mapping[str, dict[str, bytes]] = {}
 
     @abstractmethod
     def _prepare_data(self) -> None:
@@ -37,12 +39,5 @@ class BaseChartStats(BaseStats[T], ABC):
         return self
 
     def _generate_all_plot_groups(self) -> None:
-        """Convert each chart in each group to PNG."""
-        renderer = ChartRenderer()
-        self.plot_groups = {}
-
-        for group_name, charts in self.chart_groups.items():
-            self.plot_groups[group_name] = {
-                f"{chart_name}.png": renderer.to_png(chart)
-                for chart_name, chart in charts.items()
-            }
+        """Expose each group as PNGs, rendered when the group is first read."""
+        self.plot_groups = PlotGroups(self.chart_groups)
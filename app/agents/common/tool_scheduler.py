@@ -0,0 +1,90 @@
+import logging
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from graphlib import TopologicalSorter
+from typing import Any, Protocol
+
+import pandas as pd
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ToolContext(Protocol):
+    df: pd.DataFrame
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+    """
+    An analysis tool, with the metadata columns it reads and the names of the tools
+    that must have run before it.
+    """
+
+    func: Callable[[Any], Any]
+    inputs: tuple[str, ...] = ()
+    depends_on: tuple[str, ...] = ()
+
+    @property
+    def name(self) -> str:
+        return self.func.__name__
+
+
+def run_tools(
+    pctx: ToolContext,
+    tools: list[ToolSpec],
+    max_workers: int = settings.analysis_tool_workers,
+) -> dict[str, bool]:
+    """
+    Run the tools on `pctx` as soon as their dependencies are done, up to
+    `max_workers` at once, so that the analysis takes as long as its longest chain of
+    tools. With a single worker, tools run one after the other in the order of `tools`.
+
+    A failing tool is logged and the tools depending on it are skipped. Returns
+    whether each tool succeeded.
+    """
+    specs = {tool.name: tool for tool in tools}
+    order = {name: index for index, name in enumerate(specs)}
+    for tool in tools:
+        unknown = set(tool.depends_on) - set(specs)
+        if unknown:
+            raise ValueError(f"Tool `{tool.name}` depends on unknown tools {unknown}")
+
+    graph = TopologicalSorter({tool.name: tool.depends_on for tool in tools})
+    graph.prepare()  # raises CycleError on circular dependencies
+    succeeded: dict[str, bool] = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        running: dict[Future[Any], str] = {}
+        while graph.is_active():
+            for name in sorted(graph.get_ready(), key=order.__getitem__):
+                failed = [dep for dep in specs[name].depends_on if not succeeded[dep]]
+                if failed:
+                    logger.warning(f"⏭️ Skipping tool `{name}`, {failed} failed")
+                    succeeded[name] = False
+                    graph.done(name)
+                    continue
+                _check_inputs(pctx, specs[name])
+                running[executor.submit(specs[name].func, pctx)] = name
+
+            if not running:
+                continue
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    future.result()
+                    succeeded[name] = True
+                except Exception:
+                    logger.exception(f"❌ Tool `{name}` failed")
+                    succeeded[name] = False
+                graph.done(name)
+    return succeeded
+
+
+def _check_inputs(pctx: ToolContext, tool: ToolSpec) -> None:
+    missing = [column for column in tool.inputs if column not in pctx.df.columns]
+    if missing:
+        logger.warning(f"⚠️ Tool `{tool.name}` runs without the columns {missing}")
@@ -3,8 +3,8 @@ import pandas as pd
 import umap
 from sklearn.cluster import DBSCAN
 
+from agents.common.embedding_store import stack_embeddings
 from agents.common.stats.analysis.base_stats import BaseStats
-from agents.common.utils import convert_to_list
 
 
 class ClipStats(BaseStats["ClipStats"]):
@@ -22,13 +22,8 @@ class ClipStats(BaseStats["ClipStats"]):
         self.dbscan_eps = dbscan_eps
         self.dbscan_min_samples = dbscan_min_samples
 
-        self.df["clip_embeddings"] = self.df["clip_embeddings"].apply(convert_to_list)
-        self.df = self.df[
-            self.df["clip_embeddings"].apply(
-                lambda x: isinstance(x, list) and len(x) > 0
-            )
-        ]
-        self.embeddings = np.array(self.df["clip_embeddings"].tolist())
+        self.embeddings, has_embeddings = stack_embeddings(self.df["clip_embeddings"])
+        self.df = self.df[has_embeddings]
         self.asset_ids = self.df["asset_id"].tolist()
 
         self.outlier_indices: list[int] = []
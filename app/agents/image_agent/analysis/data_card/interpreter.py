@@ -3,6 +3,7 @@ import json
 from pydantic_ai.agent import AgentRunResult
 
 from agents.common.interpreter.analysis.base_interpreter import BaseInterpreter
+from agents.common.llm_runner import run_agent
 from agents.common.models.contents import ReportContent
 from agents.common.utils import (
     dict_to_markdown_table,
@@ -15,7 +16,7 @@ class DataCardInterpreter(BaseInterpreter[DataCardStats, ReportContent]):
     def interpret(self) -> AgentRunResult[DataCard]:
         if not self.agent:
             raise ValueError("Agent is not set for DataCardInterpreter")
-        return self.agent.run_sync(json.dumps(self.stats.context))
+        return run_agent(self.agent, json.dumps(self.stats.context))
 
     def format(
         self,
@@ -3,7 +3,8 @@ from typing import Any
 
 from pydantic_ai.agent import AgentRunResult
 
-from agents.common.interpreter.base_interpreter import BaseInterpreter
+from agents.common.interpreter.analysis.base_interpreter import BaseInterpreter
+from agents.common.llm_runner import run_agent
 from agents.common.models.actions import PossibleActions
 from agents.common.models.contents import Assets, ReportContent
 from agents.common.utils import clean_newlines, data_reference_tag
@@ -23,10 +24,14 @@ class SemanticCaptionInterpreter(BaseInterpreter[SemanticCaptionStats, ReportCon
             raise ValueError("Agent is not set for SemanticCaptionInterpreter")
 
         clusters = prepare_clusters_for_agent(self.stats.cluster_caption_summary)
-        return self.agent.run_sync(json.dumps(clusters))
+        return run_agent(self.agent, json.dumps(clusters))
 
     def format(
-        self, section: str, sub_section: str, agent_output: AgentRunResult[Any]
+        self,
+        section: str,
+        sub_section: str,
+        content_name: str,
+        agent_output: AgentRunResult[Any],
     ) -> ReportContent:
         if self.stats.clustered_df is None or self.stats.clustered_df.empty:
             raise ValueError("Clustered DataFrame is not set in stats")
@@ -64,7 +69,7 @@ Associated images: {data_reference_tag(chart_id)}
 """)
 
         return ReportContent(
-            name="Semantic Caption Clustering",
+            name=content_name,
             section=section,
             sub_section=sub_section,
             text=full_text.strip(),
@@ -2,7 +2,7 @@ import pandas as pd
 from sklearn.cluster import DBSCAN
 from sklearn.feature_extraction.text import TfidfVectorizer
 
-from agents.common.stats.base_stats import BaseStats
+from agents.common.stats.analysis.base_stats import BaseStats
 
 
 class SemanticCaptionStats(BaseStats["SemanticCaptionStats"]):
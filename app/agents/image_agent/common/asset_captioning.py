@@ -1,23 +1,48 @@
-import gc
+import logging
+import os
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from io import BytesIO
 
 import picsellia
 import requests
-import torch
 from PIL import Image
 
-from agents.common.ai_models.captioning_model import CaptioningModel
+from agents.common.ai_models.registry import get_captioning_model
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# BLIP resizes its inputs to 384 pixels, JPEG images are decoded at a reduced scale
+# that stays above it
+DECODE_SIZE = (768, 768)
 
 
 class AssetCaptioning:
-    def __init__(self) -> None:
-        """Initialize the captioning process with the CaptioningModel."""
-        self.captioning_model = CaptioningModel()
+    def __init__(
+        self,
+        batch_size: int = settings.captioning_batch_size,
+        max_workers: int = settings.captioning_download_workers,
+    ) -> None:
+        """Initialize the captioning process with the shared CaptioningModel."""
+        self.captioning_model = get_captioning_model()
+        self.batch_size = max(1, batch_size)
+        self.max_workers = max(1, max_workers)
 
-    def get_image_from_asset(self, asset: picsellia.Asset) -> Image.Image:
-        """Fetch the image from the asset URL."""
+    def get_image_from_asset(
+        self, asset: picsellia.Asset, path: str | None = None
+    ) -> Image.Image:
+        """Open the image of the asset from `path` if already downloaded, else its URL."""
         try:
-            img_url = asset.url
-            return Image.open(requests.get(img_url, stream=True).raw).convert("RGB")
+            if path is not None and os.path.exists(path):
+                image = Image.open(path)
+            else:
+                response = requests.get(asset.url, timeout=60)
+                response.raise_for_status()
+                image = Image.open(BytesIO(response.content))
+            image.draft("RGB", DECODE_SIZE)
+            return image.convert("RGB")
         except Exception as e:
             raise Exception(f"Error fetching image from asset: {e}") from e
 
@@ -25,16 +50,70 @@ class AssetCaptioning:
         """
         Generate captions for an asset. In the future, we may extend this to support captioning based on labels.
         """
-        try:
-            image = self.get_image_from_asset(asset)
+        image = self.get_image_from_asset(asset)
+        return self.captioning_model.generate_caption(image)
 
-            caption = self.captioning_model.generate_caption(image)
+    def caption_assets(
+        self, assets: list[picsellia.Asset], paths: list[str | None] | None = None
+    ) -> list[str | None]:
+        """
+        Caption assets `batch_size` images per `generate` call, while the next images
+        are being loaded. `paths` are the local files of the assets, if any. Assets
+        whose image cannot be loaded or captioned get None.
+        """
+        paths = paths if paths is not None else [None] * len(assets)
+        captions: list[str | None] = []
+        batch: list[Image.Image | None] = []
 
-            gc.collect()
-            torch.cuda.empty_cache() if torch.cuda.is_available() else None
+        def caption_batch() -> None:
+            images = [image for image in batch if image is not None]
+            try:
+                generated = iter(
+                    self.captioning_model.generate_captions(images) if images else []
+                )
+            except Exception:
+                logger.exception(f"Could not caption a batch of {len(images)} images")
+                generated = iter([None] * len(images))
+            captions.extend(
+                next(generated) if image is not None else None for image in batch
+            )
+            batch.clear()
 
-            return caption
-        except Exception as e:
-            gc.collect()
-            torch.cuda.empty_cache() if torch.cuda.is_available() else None
-            raise e
+        for image in self._iter_images(assets, paths):
+            batch.append(image)
+            if len(batch) == self.batch_size:
+                caption_batch()
+        if batch:
+            caption_batch()
+        return captions
+
+    def _iter_images(
+        self, assets: list[picsellia.Asset], paths: list[str | None]
+    ) -> Iterator[Image.Image | None]:
+        """
+        Load the images on a pool of `max_workers` threads, at most `2 * max_workers`
+        ahead of the consumer, and yield them in order.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending: deque[tuple[picsellia.Asset, Future[Image.Image]]] = deque()
+
+            def next_image() -> Image.Image | None:
+                asset, future = pending.popleft()
+                try:
+                    return future.result()
+                except Exception as e:
+                    logger.warning(f"Could not load image of asset {asset.id}: {e}")
+                    return None
+
+            try:
+                for asset, path in zip(assets, paths, strict=True):
+                    pending.append(
+                        (asset, executor.submit(self.get_image_from_asset, asset, path))
+                    )
+                    if len(pending) >= 2 * self.max_workers:
+                        yield next_image()
+                while pending:
+                    yield next_image()
+            finally:
+                for _, future in pending:
+                    future.cancel()
@@ -1,16 +1,29 @@
+from collections.abc import Iterable, Iterator
+
 from picsellia import DatasetVersion
-from picsellia.sdk.asset import MultiAsset
+from picsellia.sdk.asset import Asset
+
+from agents.common.embedding_store import EmbeddingStore
+from agents.common.picsellia.list_embeddings import load_image_embeddings
 
 
 def load_all_assets_and_vectors(
-    assets: MultiAsset, dataset_version: DatasetVersion, count: int
-) -> MultiAsset:
-    vectors = {}
-    for point in dataset_version.list_embeddings(limit=count):
-        vectors[point["id"]] = point["vector"]
+    batches: Iterable[list[Asset]],
+    dataset_version: DatasetVersion,
+    count: int | None = None,
+) -> Iterator[list[Asset]]:
+    """
+    Load the image embeddings of the dataset version, then attach them to the batches
+    of assets as they are consumed.
+    """
+    store = load_image_embeddings(dataset_version, count=count)
+    return _attach_vectors(batches, store)
+
 
-    for asset in assets:
-        asset._embeddings = vectors[str(asset.data_id)][
-            "open_clip||ViT-B-16||datacomp_xl_s13b_b90k"
-        ]
-    return assets
+def _attach_vectors(
+    batches: Iterable[list[Asset]], store: EmbeddingStore
+) -> Iterator[list[Asset]]:
+    for batch in batches:
+        for asset in batch:
+            asset._embeddings = store[str(asset.data_id)]
+        yield batch
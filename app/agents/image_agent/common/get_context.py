@@ -5,6 +5,7 @@ import pandas as pd
 import picsellia
 import requests
 
+from agents.common.embedding_store import embeddings_to_lists
 from agents.common.metadata.image_metadata_processor import ImageMetadataProcessor
 from agents.image_agent.models.analysis_results import ExtendedAnalysisResult
 from agents.image_agent.models.images import ImageGroup, QualityImage
@@ -21,11 +22,13 @@ class PContext:
         ctx_path: str | None = None,
         local: bool = False,
         force_recompute: bool = True,
+        incremental: bool = False,
     ):
         self.ctx_path = ctx_path
         self.context_service = context_service
         self.dataset_id = context_service.dataset_id
         self.local = local
+        self.incremental = incremental
         self.metadata = None
         self.outlier_groups: list[ImageGroup] = []
         self.contrast_analysis: list[ExtendedAnalysisResult] = []
@@ -73,10 +76,24 @@ class PContext:
 
     def generate_context(self, dataset: picsellia.DatasetVersion = None) -> None:
         self.df = ImageMetadataProcessor(
-            context_service=self.context_service, dataset_version=dataset
+            context_service=self.context_service,
+            dataset_version=dataset,
+            previous_metadata=self._get_previous_metadata(),
         ).process()
         self.context_service.sync_metadata(self.df)
-        self.context_service.upload_metadata_to_s3(agent_type="image_agent")
+        self.context_service.upload_metadata_to_s3(
+            agent_type="image_agent", metadata=self.df
+        )
+
+    def _get_previous_metadata(self) -> pd.DataFrame | None:
+        """Metadata stored by the last run of this report, used as baseline in incremental mode."""
+        if not self.incremental:
+            return None
+        previous = self.context_service.get_metadata(agent_type="image_agent")
+        if isinstance(previous, pd.DataFrame) and not previous.empty:
+            return previous
+        logger.info("No previous metadata found, computing the full context.")
+        return None
 
     def get(self, cols: list | None = None) -> pd.DataFrame:
         standard_columns = ["asset_id", "filename", "asset_url"]
@@ -88,9 +105,11 @@ class PContext:
 
     def sync(self) -> None:
         if self.local:
-            self.df.to_csv(self.ctx_path, index=False)
+            embeddings_to_lists(self.df).to_csv(self.ctx_path, index=False)
             logger.info(f"Context synced to local file: {self.ctx_path}")
         else:
             self.context_service.sync_metadata(self.df)
-            self.context_service.upload_metadata_to_s3(agent_type="image_agent")
+            self.context_service.upload_metadata_to_s3(
+                agent_type="image_agent", metadata=self.df
+            )
             logger.info(f"Context synced to remote dataset: {self.dataset_id}")
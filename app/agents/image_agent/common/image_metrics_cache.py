@@ -0,0 +1,169 @@
+import logging
+import os
+import sqlite3
+import time
+from collections.abc import Iterator
+from contextlib import closing
+from typing import Literal
+
+import numpy as np
+
+from agents.image_agent.common.image_blurriness_compute import ImageQualityMetrics
+from config.settings import settings
+from services.redis_config import redis_client as cache
+
+logger = logging.getLogger(__name__)
+
+# One packed record per image, little-endian so entries can be shared between hosts
+_RECORD_FORMATS: dict[str, tuple[str, tuple[int, ...]]] = {
+    "is_blurry": ("?", ()),
+    "is_corrupted": ("?", ()),
+    "blur_score": ("<f8", ()),
+    "width": ("<i8", ()),
+    "height": ("<i8", ()),
+    "file_size_bytes": ("<i8", ()),
+    "color": ("<f8", (4,)),
+    "luminance": ("<f8", ()),
+    "contrast": ("<f8", ()),
+}
+_RECORD_FIELDS: tuple[str, ...] = tuple(_RECORD_FORMATS)
+_RECORD_DTYPE = np.dtype([(field, *_RECORD_FORMATS[field]) for field in _RECORD_FIELDS])
+
+
+class ImageMetricsCache:
+    """
+    Cache of image quality metrics keyed by the data id of each asset.
+
+    A data id identifies the stored file, so it is shared by every dataset version
+    that contains the image and its pixels do not change; re-analysing a forked
+    version only needs to score the images it added. Keys also carry the scoring
+    configuration (decode mode and blur threshold) so that changing it does not
+    return stale scores. Corrupted images are never cached, since a failed download
+    would look the same. Cache errors are logged and treated as misses.
+    """
+
+    VERSION = 2
+    BATCH_SIZE = 500
+
+    def __init__(
+        self,
+        backend: Literal["redis", "local", "none"] = settings.image_metrics_cache,
+        ttl: int = settings.image_metrics_cache_ttl,
+        path: str = settings.image_metrics_cache_path,
+        blur_threshold: float = 90.0,
+        fast: bool = settings.image_metrics_fast_decode,
+        max_side: int = settings.image_metrics_max_side,
+    ):
+        self.backend = backend
+        self.ttl = ttl
+        self.path = path
+        decode = f"fast{max_side}" if fast else "full"
+        self.prefix = f"image_metrics:v{self.VERSION}:{decode}:{blur_threshold:g}:"
+
+    def lookup(self, data_ids: list[str]) -> tuple[np.ndarray, ImageQualityMetrics]:
+        """
+        Fetch cached metrics. Returns a boolean mask of the hits in `data_ids` and the
+        metrics of the hits, in the same order.
+        """
+        hits = np.zeros(len(data_ids), dtype=bool)
+        if self.backend == "none" or not data_ids:
+            return hits, ImageQualityMetrics.empty(0)
+
+        records = []
+        try:
+            for start, values in self._get_batches(data_ids):
+                for offset, value in enumerate(values):
+                    if value is not None and len(value) == _RECORD_DTYPE.itemsize:
+                        hits[start + offset] = True
+                        records.append(value)
+        except Exception:
+            logger.warning("Could not read the image metrics cache", exc_info=True)
+            return np.zeros(len(data_ids), dtype=bool), ImageQualityMetrics.empty(0)
+
+        return hits, self._unpack(b"".join(records))
+
+    def store(self, data_ids: list[str], metrics: ImageQualityMetrics) -> None:
+        """Cache the metrics of successfully scored images."""
+        if self.backend == "none" or not data_ids:
+            return
+
+        valid = np.flatnonzero(~metrics.is_corrupted)
+        records = self._pack(metrics.select(valid))
+        items = {
+            self.prefix + data_ids[index]: record.tobytes()
+            for index, record in zip(valid, records, strict=True)
+        }
+        try:
+            if self.backend == "redis":
+                self._redis_set(items)
+            else:
+                self._local_set(items)
+        except Exception:
+            logger.warning("Could not write the image metrics cache", exc_info=True)
+
+    def _get_batches(
+        self, data_ids: list[str]
+    ) -> Iterator[tuple[int, list[bytes | None]]]:
+        for start in range(0, len(data_ids), self.BATCH_SIZE):
+            keys = [
+                self.prefix + data_id
+                for data_id in data_ids[start : start + self.BATCH_SIZE]
+            ]
+            if self.backend == "redis":
+                yield start, cache.mget(keys)
+            else:
+                yield start, self._local_get(keys)
+
+    def _redis_set(self, items: dict[str, bytes]) -> None:
+        keys = list(items)
+        for start in range(0, len(keys), self.BATCH_SIZE):
+            pipeline = cache.pipeline(transaction=False)
+            for key in keys[start : start + self.BATCH_SIZE]:
+                pipeline.set(key, items[key], ex=self.ttl)
+            pipeline.execute()
+
+    def _connect(self) -> sqlite3.Connection:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS image_metrics "
+            "(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+        )
+        return connection
+
+    def _local_get(self, keys: list[str]) -> list[bytes | None]:
+        with closing(self._connect()) as connection:
+            rows = connection.execute(
+                "SELECT key, value FROM image_metrics "
+                f"WHERE expires_at > ? AND key IN ({', '.join('?' * len(keys))})",
+                [time.time(), *keys],
+            ).fetchall()
+        values = dict(rows)
+        return [values.get(key) for key in keys]
+
+    def _local_set(self, items: dict[str, bytes]) -> None:
+        expires_at = time.time() + self.ttl
+        with closing(self._connect()) as connection, connection:
+            connection.execute(
+                "DELETE FROM image_metrics WHERE expires_at <= ?", (time.time(),)
+            )
+            connection.executemany(
+                "INSERT OR REPLACE INTO image_metrics VALUES (?, ?, ?)",
+                [(key, value, expires_at) for key, value in items.items()],
+            )
+
+    @staticmethod
+    def _pack(metrics: ImageQualityMetrics) -> np.ndarray:
+        records = np.empty(len(metrics), dtype=_RECORD_DTYPE)
+        for field in _RECORD_FIELDS:
+            records[field] = getattr(metrics, field)
+        return records
+
+    @staticmethod
+    def _unpack(data: bytes) -> ImageQualityMetrics:
+        records = np.frombuffer(data, dtype=_RECORD_DTYPE)
+        return ImageQualityMetrics(
+            **{field: records[field].copy() for field in _RECORD_FIELDS}
+        )
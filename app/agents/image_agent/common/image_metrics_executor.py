@@ -0,0 +1,79 @@
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Literal
+
+from agents.image_agent.common.image_blurriness_compute import (
+    ImageQualityMetrics,
+    assess_images,
+)
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ImageMetricsExecutor:
+    """
+    Compute image quality metrics on a pool of workers.
+
+    Images are submitted in chunks of `chunk_size` filenames and every chunk comes
+    back as an `ImageQualityMetrics` batch. The "process" backend scores images in
+    separate processes so that decoding and NumPy reductions do not contend on the
+    GIL; it falls back to threads when the current process is not allowed to fork
+    children (e.g. a daemonic Celery prefork worker).
+    """
+
+    def __init__(
+        self,
+        backend: Literal["thread", "process"] = settings.image_metrics_backend,
+        max_workers: int | None = settings.image_metrics_workers,
+        chunk_size: int = settings.image_metrics_chunk_size,
+        blur_threshold: float = 90.0,
+        fast: bool = settings.image_metrics_fast_decode,
+        max_side: int = settings.image_metrics_max_side,
+    ):
+        if backend == "process" and multiprocessing.current_process().daemon:
+            logger.warning(
+                "Daemonic processes cannot start a process pool, "
+                "falling back to the thread backend for image metrics."
+            )
+            backend = "thread"
+        self.backend = backend
+        self.max_workers = max_workers
+        self.chunk_size = max(1, chunk_size)
+        self.blur_threshold = blur_threshold
+        self.fast = fast
+        self.max_side = max_side
+        self._executor: Executor | None = None
+
+    def __enter__(self) -> "ImageMetricsExecutor":
+        if self.backend == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+    def score(self, filenames: list[str]) -> ImageQualityMetrics:
+        """Score images and return their metrics in the order of `filenames`."""
+        if self._executor is None:
+            raise RuntimeError("ImageMetricsExecutor must be used as a context manager")
+
+        futures = [
+            self._executor.submit(
+                assess_images,
+                filenames[start : start + self.chunk_size],
+                self.blur_threshold,
+                self.fast,
+                self.max_side,
+            )
+            for start in range(0, len(filenames), self.chunk_size)
+        ]
+        return ImageQualityMetrics.concatenate([future.result() for future in futures])
@@ -1,19 +1,14 @@
-import traceback
-
 import pandas as pd
 
+from agents.common.tool_scheduler import run_tools
 from agents.common.tools import PicselliaBaseTool
 from agents.image_agent.common.get_context import PContext
 from agents.image_agent.tools import ALL_TOOLS
+from services.context import ContextService
 
 
 def run_analysis(pctx: PContext) -> PContext:
-    for tool in ALL_TOOLS:
-        try:
-            tool(pctx)
-        except Exception:
-            print(f"❌ Tool `{tool.__name__}` failed:")
-            print(traceback.format_exc())
+    run_tools(pctx, ALL_TOOLS)
     pctx.sync()
     return pctx
 
@@ -130,11 +125,22 @@ class ImageAnalyticsTool(PicselliaBaseTool):
     }
     output_type = "object"
 
+    def __init__(
+        self, context_service: ContextService, incremental: bool = False, **kwargs
+    ) -> None:
+        super().__init__(context_service=context_service, **kwargs)
+        self.incremental = incremental
+
     def forward(self, dataset_id: str | None = None) -> pd.DataFrame:
-        pctx = PContext(context_service=self.context_service)
-        pctx = run_analysis(pctx)
+        pctx = run_analysis(self.build_context())
         return pctx.df
 
+    def build_context(self) -> PContext:
+        """Compute the image metadata, without running the analyses on it."""
+        return PContext(
+            context_service=self.context_service, incremental=self.incremental
+        )
+
 
 class GetDatasetDataframe(PicselliaBaseTool):
     name = "get_dataset_dataframe"
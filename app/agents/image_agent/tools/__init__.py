@@ -1,9 +1,11 @@
+from agents.common.tool_scheduler import ToolSpec
+
 from .analyze_images_quality import analyze_images_quality
 from .build_dataset_datacard import build_dataset_datacard
 from .detect_clip_embedding_outliers import detect_clip_outliers
 
 ALL_TOOLS = [
-    build_dataset_datacard,
-    analyze_images_quality,
-    detect_clip_outliers,
+    ToolSpec(build_dataset_datacard),
+    ToolSpec(analyze_images_quality, inputs=("blur_score", "contrast", "luminance")),
+    ToolSpec(detect_clip_outliers, inputs=("clip_embeddings",)),
 ]
@@ -12,7 +12,7 @@ from agents.image_agent.common.get_context import PContext
 from agents.image_agent.models.semantic import (
     SemanticGroup,
 )
-from services.report_enums import SubSectionName
+from services.report_enums import ReportContentName
 
 system_prompt = """
 TASK: Analyze semantic clusters of image captions to extract key dataset insights and format results according to specified Pydantic models
@@ -64,8 +64,9 @@ def extract_semantic_concepts(pctx: PContext) -> ReportContent:
     content = SemanticCaptionInterpreter(
         stats=stats, agent=semantic_analyzer_agent
     ).run(
-        section=SubSectionName.CAPTION_CLUSTERING.section.value,
-        sub_section=SubSectionName.CAPTION_CLUSTERING.name,
+        section=ReportContentName.CAPTION_CLUSTERING.section,
+        sub_section=ReportContentName.CAPTION_CLUSTERING.sub_section,
+        content_name=ReportContentName.CAPTION_CLUSTERING.content,
     )
     pctx.context_service.sync_content(content)
     return content
@@ -65,6 +65,7 @@ def compute_analysis(request: AnalysisRequest):
         report_id=request.report_id,
         report_object_name=request.report_object_name,
         chat_messages_object_name=request.chat_messages_object_name,
+        incremental=request.incremental,
     )
 
 
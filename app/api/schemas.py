@@ -9,6 +9,8 @@ class AnalysisRequest(BaseModel):
     report_id: str
     report_object_name: str
     chat_messages_object_name: str
+    # Only recompute assets and annotations that changed since the last run of the report
+    incremental: bool = False
 
 
 class ChatRequest(BaseModel):
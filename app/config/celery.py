@@ -1,7 +1,10 @@
+from typing import Any
+
 from celery import Celery, Task
+from celery.signals import worker_process_init
 
 from config.sentry import init_sentry
-from config.settings import Settings
+from config.settings import Settings, settings
 
 
 class CeleryConfig:
@@ -71,4 +74,12 @@ def create_app(settings: Settings | None = None) -> Celery:
     return celery_app
 
 
+@worker_process_init.connect
+def preload_models(**kwargs: Any) -> None:
+    """Load the AI models once per worker process, before its first analysis."""
+    from agents.common.ai_models.registry import model_registry
+
+    model_registry.preload(settings.preload_models)
+
+
 app = create_app()
@@ -27,7 +27,86 @@ class Settings(BaseSettings):
     formatter_model: LLMConfig = LLMConfig()
 
     picsellia_sdk_custom_logging: bool = False
+    # Models loaded when a worker process starts ("clip", "captioning", "sam"),
+    # the others are loaded on first use and then kept for the next analyses
+    preload_models: list[str] = []
+    # Least recently used models are released over these limits, None to disable
+    max_loaded_models: int | None = None
+    models_memory_limit_mb: int | None = None
+    # Reuse label text embeddings across analyses, keyed by model, prompt and label
+    text_embeddings_cache: Literal["redis", "none"] = "redis"
+    text_embeddings_cache_ttl: int = 30 * 24 * 3600
+    # "int8" runs CLIP and BLIP with dynamic int8 quantization on CPU workers, kept
+    # only if their outputs stay this close (cosine similarity) to the fp32 ones
+    cpu_inference_backend: Literal["fp32", "int8"] = "fp32"
+    int8_min_similarity: float = 0.98
     fast_sam_path: str = "FastSAM-x.pt"
+    # Images segmented per FastSAM pass when checking box tightness
+    sam_batch_size: int = 8
+    # Share of the assets checked for box tightness, randomly sampled and capped by
+    # `tightness_max_assets` (None checks them all)
+    tightness_sample_fraction: float = 1.0
+    tightness_max_assets: int | None = None
+    # Seconds after which no new batch of images is checked, None to disable
+    tightness_time_budget: float | None = 900
+    # Threads downloading images ahead of SAM
+    tightness_download_workers: int = 8
+
+    # Charts are rendered to PNG in a pool of processes ("inline" renders them in
+    # the task), PNGs of unchanged charts are reused
+    chart_render_backend: Literal["process", "inline"] = "process"
+    chart_render_workers: int | None = None
+    chart_render_cache_size: int = 256
+
+    # Reuse the LLM interpretation of identical prompts and charts across reports
+    llm_interpretation_cache: bool = True
+    llm_interpretation_cache_ttl: int = 30 * 24 * 3600
+    # Tries and first backoff (seconds, doubled on each retry) of platform callbacks
+    callback_max_tries: int = 5
+    callback_initial_wait: float = 0.5
+    # Analysis tools run at once, as soon as the tools they depend on are done
+    analysis_tool_workers: int = 4
+
+    # Format of the image/annotation metadata uploaded with reports, CSV files of
+    # older reports are still read when there is no NPZ archive
+    metadata_artifact_format: Literal["npz", "csv"] = "npz"
+    # Cache the metadata of reports in Redis (compressed, up to `max_bytes`) and keep
+    # the last ones read in the memory of each worker
+    metadata_cache: bool = True
+    metadata_cache_ttl: int = 7 * 24 * 3600
+    metadata_cache_max_bytes: int = 64 * 1024 * 1024
+    metadata_memory_cache_size: int = 8
+
+    # Concurrent requests used to list the assets of a dataset version
+    list_assets_workers: int = 8
+    # Points per request when scrolling through image and shape embeddings
+    embeddings_page_size: int = 100
+
+    # Stream assets in bounded windows instead of downloading the whole version
+    image_metadata_streaming: bool = True
+    image_metadata_window_size: int = 256
+    image_metadata_prefetch_windows: int = 1
+
+    # "process" scores images outside of the GIL, it needs a non-daemonic worker
+    # (e.g. `celery worker --pool=threads`), otherwise threads are used
+    image_metrics_backend: Literal["thread", "process"] = "thread"
+    image_metrics_workers: int | None = None
+    image_metrics_chunk_size: int = 32
+    # Compute color, luminance and contrast on a reduced decode, the blur score stays
+    # at full resolution: 1.5 to 5x faster, with a 2 to 8% lower contrast (see
+    # `assess_bluriness_and_corruption_fast`)
+    image_metrics_fast_decode: bool = False
+    image_metrics_max_side: int = 1024
+    # Reuse image metrics across dataset versions, keyed by the data id of each asset
+    image_metrics_cache: Literal["redis", "local", "none"] = "redis"
+    image_metrics_cache_ttl: int = 30 * 24 * 3600
+    image_metrics_cache_path: str = "image_metrics_cache.sqlite3"
+
+    # Caption images with BLIP, needed by the semantic analysis
+    image_captioning: bool = False
+    captioning_batch_size: int = 16
+    # Threads loading images ahead of the captioning model
+    captioning_download_workers: int = 8
 
     model_config = SettingsConfigDict(
         env_file=os.path.join(os.path.dirname(__file__), ".env"),
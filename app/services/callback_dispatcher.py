@@ -0,0 +1,88 @@
+import logging
+import queue
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+import httpx
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class CallbackDispatcher:
+    """
+    Deliver platform callbacks from a background thread, so that the analysis does not
+    wait on the platform and a failing callback does not fail the analysis.
+
+    Callbacks are delivered one at a time in the order they were submitted, by a single
+    thread started on the first submission. A burst of callbacks is drained back to back
+    on the same pooled connection. Transient errors (connection errors, timeouts, 429
+    and 5xx responses) are retried with exponential backoff, other errors are logged
+    and the callback is dropped. `flush` waits for the queue to be delivered and stops
+    the thread.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str, dict[str, Any]], Any],
+        max_tries: int = settings.callback_max_tries,
+        initial_wait: float = settings.callback_initial_wait,
+    ):
+        self.send = send
+        self.max_tries = max(1, max_tries)
+        self.initial_wait = initial_wait
+        self._queue: queue.Queue[tuple[str, dict[str, Any]] | None] = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def submit(self, url: str, data: dict[str, Any]) -> None:
+        with self._lock:
+            self._queue.put((url, data))
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="platform-callbacks", daemon=True
+                )
+                self._thread.start()
+
+    def flush(self) -> None:
+        """
+        Wait until every submitted callback is delivered or dropped. Submissions wait
+        for the flush, so that a new thread never delivers alongside the old one.
+        """
+        with self._lock:
+            if self._thread is None:
+                return
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while (item := self._queue.get()) is not None:
+            self._deliver(*item)
+
+    def _deliver(self, url: str, data: dict[str, Any]) -> None:
+        for attempt in range(self.max_tries):
+            try:
+                self.send(url, data)
+                return
+            except httpx.HTTPStatusError as e:
+                status = e.response.status_code
+                if status != 429 and status < 500:
+                    logger.error(
+                        f"❌ Platform rejected a {data.get('type')} callback: {e}"
+                    )
+                    return
+                error: Exception = e
+            except httpx.TransportError as e:
+                error = e
+            except Exception:
+                logger.exception(f"❌ Could not send a {data.get('type')} callback")
+                return
+            if attempt + 1 < self.max_tries:
+                time.sleep(self.initial_wait * 2**attempt)
+        logger.error(
+            f"❌ Dropped a {data.get('type')} callback after {self.max_tries} tries: {error}"
+        )
@@ -1,7 +1,9 @@
+import copy
 import json
 import logging
 import os
 import tempfile
+import threading
 from collections import defaultdict
 from typing import Literal
 from urllib.parse import urlparse
@@ -11,6 +13,7 @@ import pandas as pd
 from picsellia import Client
 from picsellia.types.enums import ObjectDataType
 
+from agents.common.embedding_store import embeddings_to_lists
 from agents.common.models.contents import (
     ChatMessage,
     ReportContent,
@@ -20,7 +23,11 @@ from agents.common.models.contents import (
 from api.clients.hinokuni import callback_platform
 from api.clients.httpx_client import client as httpx_client
 from api.clients.picsellia_sdk import get_client
+from config.settings import settings
+from services.callback_dispatcher import CallbackDispatcher
 from services.file_handler import FileService
+from services.metadata_artifact import read_metadata_artifact, write_metadata_artifact
+from services.metadata_cache import metadata_cache
 from services.redis_config import redis_client as cache
 
 logger = logging.getLogger(__name__)
@@ -50,6 +57,11 @@ class ContextService:
         self.md_report = ""
         self.metadata = pd.DataFrame()
         self.file_service = FileService(client)
+        self._metadata_object_names: dict[tuple[str, str], str] = {}
+        # The image and annotation pipelines share the service from two threads
+        self._lock = threading.RLock()
+        # Platform callbacks of this report, delivered in order in the background
+        self.callbacks = CallbackDispatcher(send=self._send_callback)
         if context_object_name:
             self.context_object_name = context_object_name
         self.chat_session_object_name = chat_session_object_name
@@ -80,9 +92,6 @@ class ContextService:
     def _get_chat_session_cache_key(self) -> str:
         return f"dataset_chat_session_{self.dataset_id}_{self.report_id}"
 
-    def _get_metadata_cache_key(self) -> str:
-        return f"dataset_metadata_{self.dataset_id}_{self.report_id}"
-
     def _get_from_cache(self, cache_key: str) -> dict | pd.DataFrame | None:
         cached_data = cache.get(cache_key)
         if cached_data is None:
@@ -107,7 +116,7 @@ class ContextService:
         self,
         data: dict | pd.DataFrame,
         object_name: str,
-        cache_key: str,
+        cache_key: str | None,
         file_type: str = "json",
     ) -> None:
         """
@@ -115,7 +124,8 @@ class ContextService:
         Args:
             data: The data to upload (Dict for context, DataFrame for metadata)
             object_name: The object_name of the file to upload
-            file_type: The type of file ("json" or "csv")
+            cache_key: The cache entry of JSON files, metadata has its own cache
+            file_type: The type of file ("json", "csv" or "npz")
         """
         with tempfile.NamedTemporaryFile(
             suffix=f".{file_type}", delete=False
@@ -126,33 +136,45 @@ class ContextService:
             if file_type == "json":
                 with open(temp_path, "w") as f:
                     json.dump(data, f)
-                self.set_in_cache(data, cache_key)
+                if cache_key:
+                    self.set_in_cache(data, cache_key)
+            elif file_type == "npz":
+                write_metadata_artifact(data, temp_path)  # type: ignore[arg-type]
             else:
-                data.to_csv(temp_path, index=False)  # type: ignore[union-attr]
-                self.set_in_cache(data, cache_key)
+                embeddings_to_lists(data).to_csv(temp_path, index=False)  # type: ignore[arg-type]
 
             self.file_service.upload(temp_path, object_name)
         finally:
             if os.path.exists(temp_path):
                 os.unlink(temp_path)
 
-    def upload_metadata_to_s3(self, agent_type: str) -> None:
+    def upload_metadata_to_s3(
+        self, agent_type: str, metadata: pd.DataFrame | None = None
+    ) -> None:
         """
-        Upload the metadata DataFrame to S3 as a CSV file.
+        Upload a metadata DataFrame (the last synced one by default) to S3, as an NPZ
+        archive or a CSV file depending on `settings.metadata_artifact_format`.
         """
+        file_format = settings.metadata_artifact_format
+        metadata = self.metadata if metadata is None else metadata
         self._upload_to_s3(
-            self.metadata,
-            self._get_metadata_object_name(agent_type),
-            self._get_metadata_cache_key(),
-            "csv",
+            metadata,
+            self._get_metadata_object_name(agent_type, file_format),
+            None,
+            file_format,
+        )
+        metadata_cache.store_new_version(
+            self.dataset_id, self.report_id, agent_type, metadata
         )
 
     def upload_context_to_s3(self) -> None:
         """
         Upload the context dictionary to S3 as a JSON file.
         """
+        with self._lock:
+            context = copy.deepcopy(self.context)
         self._upload_to_s3(
-            self.context,
+            context,
             self.context_object_name,
             self._get_context_cache_key(),
             "json",
@@ -171,36 +193,61 @@ class ContextService:
 
     def download_metadata_from_s3(self, agent_type: str) -> pd.DataFrame:
         """
-        Download the metadata CSV file from S3 and cache it.
+        Download the metadata file from S3. The NPZ archive is tried first
+        when it is the configured format, then the CSV file written by older reports.
         Returns:
             pd.DataFrame: The downloaded metadata
         """
-        with tempfile.NamedTemporaryFile(suffix=".csv", delete=False) as temp_file:
-            temp_path = temp_file.name
-
-        try:
-            object_name = self._get_metadata_object_name(agent_type)
-            self.file_service.download(temp_path, object_name)
-
-            self.metadata = pd.read_csv(temp_path)
-            self.set_in_cache(self.metadata, self._get_metadata_cache_key())
-        except Exception as e:
-            logger.warning(f"Failed to download metadata from S3: {e}")
-            self.metadata = {}
-        finally:
-            if os.path.exists(temp_path):
-                os.unlink(temp_path)
+        file_formats = ["csv"]
+        if settings.metadata_artifact_format == "npz":
+            file_formats = ["npz", "csv"]
+
+        self.metadata = {}
+        for file_format in file_formats:
+            with tempfile.NamedTemporaryFile(
+                suffix=f".{file_format}", delete=False
+            ) as temp_file:
+                temp_path = temp_file.name
+
+            try:
+                object_name = self._get_metadata_object_name(agent_type, file_format)
+                self.file_service.download(temp_path, object_name)
+
+                if file_format == "npz":
+                    self.metadata = read_metadata_artifact(temp_path)
+                else:
+                    self.metadata = pd.read_csv(temp_path)
+                break
+            except Exception as e:
+                logger.warning(f"Failed to download metadata from S3: {e}")
+            finally:
+                if os.path.exists(temp_path):
+                    os.unlink(temp_path)
 
         return self.metadata
 
-    def _get_metadata_object_name(self, agent_type: str) -> str:
-        if agent_type == "annotation_agent":
-            return self.annotation_agent_data_object_name
-        elif agent_type == "image_agent":
-            return self.image_agent_data_object_name
-        else:
+    def _get_metadata_object_name(
+        self, agent_type: str, file_format: str = "csv"
+    ) -> str:
+        if agent_type not in ("annotation_agent", "image_agent"):
             raise ValueError(f"Unknown agent type: {agent_type}")
 
+        if file_format == "csv":
+            if agent_type == "annotation_agent":
+                return self.annotation_agent_data_object_name
+            return self.image_agent_data_object_name
+
+        if (agent_type, file_format) not in self._metadata_object_names:
+            self._metadata_object_names[agent_type, file_format] = (
+                self.client.connexion.generate_report_object_name(
+                    filename=f"{agent_type}_data.{file_format}",
+                    object_name_type=ObjectDataType.AGENTS_REPORT,
+                    dataset_version_id=UUID(self.dataset_id),
+                    report_id=UUID(self.report_id),
+                )
+            )
+        return self._metadata_object_names[agent_type, file_format]
+
     def download_context_from_s3(self) -> dict:
         """
         Download the context JSON file from S3 and cache it.
@@ -286,21 +333,25 @@ class ContextService:
 
     def get_metadata(self, agent_type: str) -> pd.DataFrame:
         """
-        Get the metadata by trying in order:
-        1. Return if metadata is not empty
-        2. Try to get from cache
-        3. Download from S3 if all else fails
+        Get the metadata of an agent by trying in order:
+        1. Try to get from cache (memory of the process, then Redis)
+        2. Download from S3 and cache it
         """
-
-        # if not self.metadata.empty:
-        #     return self.metadata
-        #
-        # cached_metadata = self._get_from_cache(self._get_metadata_cache_key())
-        # if cached_metadata is not None:
-        #     self.metadata = cached_metadata
-        #     return self.metadata
-
-        return self.download_metadata_from_s3(agent_type=agent_type)
+        version = metadata_cache.version(self.dataset_id, self.report_id, agent_type)
+        if version is not None:
+            cached_metadata = metadata_cache.lookup(
+                self.dataset_id, self.report_id, agent_type, version
+            )
+            if cached_metadata is not None:
+                self.metadata = cached_metadata
+                return self.metadata
+
+        metadata = self.download_metadata_from_s3(agent_type=agent_type)
+        if version is not None and isinstance(metadata, pd.DataFrame):
+            metadata_cache.store(
+                self.dataset_id, self.report_id, agent_type, version, metadata
+            )
+        return metadata
 
     def get_md_report(self):
         """
@@ -325,7 +376,8 @@ class ContextService:
         Args:
             df: The metadata DataFrame to sync
         """
-        self.metadata = df
+        with self._lock:
+            self.metadata = df
 
     def sync_context(self, context: dict) -> None:
         """
@@ -333,7 +385,8 @@ class ContextService:
         Args:
             context: The context dictionary to sync
         """
-        self.context = context
+        with self._lock:
+            self.context = context
 
     def sync_content(self, content: ReportContent | ReportError | ReportEvent):
         """
@@ -341,18 +394,20 @@ class ContextService:
         Args:
             content: The content to sync
         """
-        if isinstance(content, ReportContent):
-            data = self._sync_report_content(content)
-            data_type = "content"
-        elif isinstance(content, ReportError):
-            data = self._sync_error_content(content)
-            data_type = "error"
-        elif isinstance(content, ReportEvent):
-            data = self._sync_event_content(content)
-            data_type = "event"
-        else:
-            raise ValueError("Invalid content type")
-        self._callback_platform(data_type, data)  # type: ignore[arg-type]
+        # Contents are queued for the platform in the order they are added to the context
+        with self._lock:
+            if isinstance(content, ReportContent):
+                data = self._sync_report_content(content)
+                data_type = "content"
+            elif isinstance(content, ReportError):
+                data = self._sync_error_content(content)
+                data_type = "error"
+            elif isinstance(content, ReportEvent):
+                data = self._sync_event_content(content)
+                data_type = "event"
+            else:
+                raise ValueError("Invalid content type")
+            self._callback_platform(data_type, data)  # type: ignore[arg-type]
 
     def _sync_report_content(self, content: ReportContent):
         if "content" not in self.context:
@@ -378,11 +433,15 @@ class ContextService:
         self, type: Literal["content", "error", "event"], data: dict
     ):
         data = {"type": type, **data}
-        callback_platform(
-            http_client=httpx_client,
-            url=self.callback_url,
-            data=data,
-        )
+        self.callbacks.submit(self.callback_url, data)
+
+    @staticmethod
+    def _send_callback(url: str, data: dict) -> None:
+        callback_platform(http_client=httpx_client, url=url, data=data)
+
+    def flush_callbacks(self) -> None:
+        """Wait for the queued platform callbacks to be delivered."""
+        self.callbacks.flush()
 
     def add_message_to_chat_session(self, message: ChatMessage) -> None:
         if "chat_messages" not in self.chat_session:
@@ -390,11 +449,7 @@ class ContextService:
         self.chat_session["chat_messages"].append(message.model_dump())
 
     def send_chat_message_to_platform(self, message: ChatMessage) -> None:
-        callback_platform(
-            http_client=httpx_client,
-            url=self.callback_url,
-            data=message.model_dump(),
-        )
+        self.callbacks.submit(self.callback_url, message.model_dump())
 
     def _build_md_report(self) -> str:
         formatted_report: dict = {}
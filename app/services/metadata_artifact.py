@@ -0,0 +1,78 @@
+import json
+from typing import IO, Any
+
+import numpy as np
+import pandas as pd
+
+from agents.common.embedding_store import parse_embedding
+
+EMBEDDING_COLUMNS = ("clip_embeddings", "shape_embeddings")
+
+# Keys of the arrays stored in the archive for a column, next to its name
+EMBEDDING_SUFFIX = ".embeddings"
+MASK_SUFFIX = ".mask"
+JSON_SUFFIX = ".json"
+COLUMNS_KEY = "__columns__"
+
+
+def write_metadata_artifact(df: pd.DataFrame, path: str | IO[bytes]) -> None:
+    """
+    Save a metadata DataFrame as a compressed NPZ archive, without pickling:
+    - embedding columns become one float32 matrix plus a mask of the rows that have one,
+    - numeric and boolean columns are stored as they are,
+    - any other column is stored as a UTF-8 JSON list of its cells.
+    """
+    arrays: dict[str, np.ndarray] = {COLUMNS_KEY: np.array(df.columns, dtype=str)}
+    for column in df.columns:
+        values = df[column]
+        if column in EMBEDDING_COLUMNS:
+            embeddings, mask = _to_matrix(values)
+            arrays[column + EMBEDDING_SUFFIX] = embeddings
+            arrays[column + MASK_SUFFIX] = mask
+        elif values.dtype.kind in "biuf":
+            arrays[column] = values.to_numpy()
+        else:
+            text = json.dumps([_to_json(value) for value in values], default=str)
+            arrays[column + JSON_SUFFIX] = np.frombuffer(text.encode(), dtype=np.uint8)
+    np.savez_compressed(path, allow_pickle=False, **arrays)
+
+
+def read_metadata_artifact(path: str | IO[bytes]) -> pd.DataFrame:
+    """Load a DataFrame saved by `write_metadata_artifact`. Embedding cells are row views."""
+    with np.load(path, allow_pickle=False) as archive:
+        columns: dict[str, Any] = {}
+        for column in archive[COLUMNS_KEY].tolist():
+            if column + EMBEDDING_SUFFIX in archive:
+                embeddings = archive[column + EMBEDDING_SUFFIX]
+                mask = archive[column + MASK_SUFFIX]
+                columns[column] = [
+                    embedding if valid else None
+                    for embedding, valid in zip(embeddings, mask, strict=True)
+                ]
+            elif column + JSON_SUFFIX in archive:
+                columns[column] = json.loads(archive[column + JSON_SUFFIX].tobytes())
+            else:
+                columns[column] = archive[column]
+    return pd.DataFrame(columns)
+
+
+def _to_matrix(values: pd.Series) -> tuple[np.ndarray, np.ndarray]:
+    embeddings = [parse_embedding(value) for value in values]
+    dimension = next((len(e) for e in embeddings if e is not None), 0)
+    matrix = np.zeros((len(embeddings), dimension), dtype=np.float32)
+    mask = np.zeros(len(embeddings), dtype=bool)
+    for row, embedding in enumerate(embeddings):
+        if embedding is not None and len(embedding) == dimension:
+            matrix[row] = embedding
+            mask[row] = True
+    return matrix, mask
+
+
+def _to_json(value: Any) -> Any:
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    return value
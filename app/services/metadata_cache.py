@@ -0,0 +1,152 @@
+import io
+import logging
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from config.settings import settings
+from services.metadata_artifact import read_metadata_artifact, write_metadata_artifact
+from services.redis_config import redis_client as cache
+
+logger = logging.getLogger(__name__)
+
+
+class MetadataCache:
+    """
+    Cache of the image/annotation metadata of reports, in front of the artifacts
+    stored on S3.
+
+    Entries are keyed by the report, the agent type and the version of the artifact,
+    a counter bumped in Redis each time the artifact is uploaded, so a new upload is
+    never shadowed by an older entry, in Redis or in the memory of another worker.
+    DataFrames are stored in Redis as compressed NPZ archives (see
+    `write_metadata_artifact`), with a TTL, and archives larger than `max_bytes` are
+    not stored. The last `memory_size` DataFrames read by the process are also kept in
+    memory, so repeated reads of a chat session only cost the version lookup. Cache
+    errors are logged and treated as misses.
+    """
+
+    VERSION = 1
+
+    def __init__(
+        self,
+        enabled: bool = settings.metadata_cache,
+        ttl: int = settings.metadata_cache_ttl,
+        max_bytes: int = settings.metadata_cache_max_bytes,
+        memory_size: int = settings.metadata_memory_cache_size,
+    ):
+        self.enabled = enabled
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.memory_size = memory_size
+        self._memory: OrderedDict[str, pd.DataFrame] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def version(
+        self, dataset_id: str, report_id: str | None, agent_type: str
+    ) -> int | None:
+        """
+        Version of the artifact, 0 until the cache sees an upload. None when it is
+        unknown, the cache must then be bypassed.
+        """
+        if not self.enabled:
+            return None
+        try:
+            value = cache.get(self._version_key(dataset_id, report_id, agent_type))
+            return int(value) if value is not None else 0
+        except Exception:
+            logger.warning("Could not read the metadata cache version", exc_info=True)
+            return None
+
+    def lookup(
+        self, dataset_id: str, report_id: str | None, agent_type: str, version: int
+    ) -> pd.DataFrame | None:
+        """The cached metadata, as a copy that the caller may modify, or None."""
+        if not self.enabled:
+            return None
+        key = self._key(dataset_id, report_id, agent_type, version)
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key].copy()
+
+        try:
+            value = cache.get(key)
+            if value is None:
+                return None
+            df = read_metadata_artifact(io.BytesIO(value))
+        except Exception:
+            logger.warning("Could not read the metadata cache", exc_info=True)
+            return None
+        self._remember(key, df)
+        return df.copy()
+
+    def store(
+        self,
+        dataset_id: str,
+        report_id: str | None,
+        agent_type: str,
+        version: int,
+        df: pd.DataFrame,
+    ) -> None:
+        if not self.enabled or df.empty:
+            return
+        key = self._key(dataset_id, report_id, agent_type, version)
+        self._remember(key, df.copy())
+        try:
+            buffer = io.BytesIO()
+            write_metadata_artifact(df, buffer)
+            value = buffer.getvalue()
+            if len(value) > self.max_bytes:
+                logger.info(
+                    f"Metadata of {agent_type} is {len(value)} bytes, "
+                    "it is only cached in memory"
+                )
+                return
+            cache.set(key, value, ex=self.ttl)
+        except Exception:
+            logger.warning("Could not write the metadata cache", exc_info=True)
+
+    def store_new_version(
+        self,
+        dataset_id: str,
+        report_id: str | None,
+        agent_type: str,
+        df: pd.DataFrame,
+    ) -> None:
+        """Record an upload of the artifact, and cache its content."""
+        if not self.enabled:
+            return
+        try:
+            # Counters never expire, a reset would bring back older entries
+            version = int(
+                cache.incr(self._version_key(dataset_id, report_id, agent_type))
+            )
+        except Exception:
+            logger.warning("Could not bump the metadata cache version", exc_info=True)
+            return
+        self.store(dataset_id, report_id, agent_type, version, df)
+
+    def _remember(self, key: str, df: pd.DataFrame) -> None:
+        with self._lock:
+            self._memory[key] = df
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def _version_key(
+        self, dataset_id: str, report_id: str | None, agent_type: str
+    ) -> str:
+        return f"metadata_version:{dataset_id}:{report_id}:{agent_type}"
+
+    def _key(
+        self, dataset_id: str, report_id: str | None, agent_type: str, version: int
+    ) -> str:
+        return (
+            f"metadata:v{self.VERSION}:{dataset_id}:{report_id}:{agent_type}:{version}"
+        )
+
+
+# Shared by the context services of the process, so chat turns reuse the same entries
+metadata_cache = MetadataCache()
@@ -61,6 +61,11 @@ class ReportContentName(Enum):
         sub_section=SubSectionName.OVERVIEW.name,
         content="Metadata Overview",
     )
+    CAPTION_CLUSTERING = ContentLocator(
+        section=SubSectionName.OVERVIEW.section,
+        sub_section=SubSectionName.OVERVIEW.name,
+        content="Semantic Caption Clustering",
+    )
 
     IMAGE_STATISTICS = ContentLocator(
         section=SubSectionName.IMAGE_STATISTICS_ANALYSIS.section,
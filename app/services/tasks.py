@@ -1,7 +1,7 @@
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
-import pandas as pd
 import yaml
 from celery import shared_task
 from celery.utils.log import get_task_logger
@@ -85,11 +85,14 @@ def process_report_chat_message_task(
         chat_messages_object_name=chat_messages_object_name,
         report_id=report_id,
     )
-    context = context_service.get_context_dict()
-    if not context:
-        mcp_agent(context_service=context_service, message=message)
-    else:
-        report_agent(context_service=context_service, message=message)
+    try:
+        context = context_service.get_context_dict()
+        if not context:
+            mcp_agent(context_service=context_service, message=message)
+        else:
+            report_agent(context_service=context_service, message=message)
+    finally:
+        context_service.flush_callbacks()
 
 
 @shared_task(name="process_chat_message_task")
@@ -110,7 +113,10 @@ def process_chat_message_task(
         report_object_name=None,
         chat_messages_object_name=chat_messages_object_name,
     )
-    mcp_agent(context_service=context_service, message=message)
+    try:
+        mcp_agent(context_service=context_service, message=message)
+    finally:
+        context_service.flush_callbacks()
 
 
 @shared_task(name="compute_analysis_task")
@@ -122,9 +128,11 @@ def compute_analysis_task(
     report_id: str,
     report_object_name: str,
     chat_messages_object_name: str,
+    incremental: bool = False,
 ):
     from agents.annotation_agent.main import AnnotationAnalysisTool
     from agents.image_agent.main import ImageAnalyticsTool
+    from agents.image_agent.main import run_analysis as run_image_analysis
 
     context = get_context_service(
         api_token,
@@ -135,21 +143,37 @@ def compute_analysis_task(
         chat_messages_object_name=chat_messages_object_name,
         report_id=report_id,
     )
-    context.get_context_dict()
-    image_metadata: pd.DataFrame = ImageAnalyticsTool(context_service=context).forward()
-    context.upload_context_to_s3()
-    dataset_version = context.client.get_dataset_version_by_id(dataset_version_id)
     try:
-        annotations = dataset_version.list_annotations(limit=1)
-    except NoDataError:
-        annotations = []
-
-    if len(annotations) > 0:
-        print(f"🖼️ Found {len(annotations)} annotations in the dataset version.")
-        AnnotationAnalysisTool(context_service=context).forward(
-            image_metadata=image_metadata
+        context.get_context_dict()
+        image_tool = ImageAnalyticsTool(
+            context_service=context, incremental=incremental
         )
-
-    event = ReportEvent(event="computation_done", message="Analysis done.")
-    context.sync_content(event)
-    context.upload_context_to_s3()
+        image_pctx = image_tool.build_context()
+        dataset_version = context.client.get_dataset_version_by_id(dataset_version_id)
+        try:
+            annotations = dataset_version.list_annotations(limit=1)
+        except NoDataError:
+            annotations = []
+
+        # The annotation pipeline only needs the image metadata, it runs while the
+        # image analyses are being interpreted
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            annotation_analysis = None
+            if len(annotations) > 0:
+                print(f"🖼️ Found {len(annotations)} annotations in the dataset version.")
+                annotation_analysis = executor.submit(
+                    AnnotationAnalysisTool(
+                        context_service=context, incremental=incremental
+                    ).forward,
+                    image_metadata=image_pctx.df,
+                )
+            run_image_analysis(image_pctx)
+            context.upload_context_to_s3()
+            if annotation_analysis is not None:
+                annotation_analysis.result()
+
+        event = ReportEvent(event="computation_done", message="Analysis done.")
+        context.sync_content(event)
+        context.upload_context_to_s3()
+    finally:
+        context.flush_callbacks()
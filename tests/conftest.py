@@ -117,7 +117,7 @@ def mock_picsellia_client() -> Generator[mock.Mock, None, None]:
 @pytest.fixture(scope="function", autouse=True)
 def mock_load_assets() -> Generator[mock.Mock, None, None]:
     with mock.patch(
-        "agents.common.metadata.image_metadata_processor.load_assets"
+        "agents.common.metadata.image_metadata_processor.iter_asset_batches"
     ) as mock_load_assets:
         mock_instance = mock.Mock()
         mock_load_assets.return_value = []
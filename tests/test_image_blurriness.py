@@ -0,0 +1,38 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image, ImageFilter
+
+from agents.image_agent.common.image_blurriness_compute import (
+    assess_bluriness_and_corruption,
+    assess_bluriness_and_corruption_fast,
+)
+
+
+@pytest.fixture(scope="module")
+def noisy_image() -> Image.Image:
+    rng = np.random.default_rng(0)
+    pixels = rng.integers(0, 256, size=(2000, 3000, 3), dtype=np.uint8)
+    return Image.fromarray(pixels)
+
+
+@pytest.mark.parametrize("blur_radius", [0, 1, 3])
+@pytest.mark.parametrize("extension", ["jpg", "png"])
+def test_fast_blur_score_matches_full_resolution(
+    tmp_path: Path, noisy_image: Image.Image, blur_radius: int, extension: str
+) -> None:
+    path = str(tmp_path / f"image.{extension}")
+    noisy_image.filter(ImageFilter.GaussianBlur(blur_radius)).save(path)
+
+    full = assess_bluriness_and_corruption(path)
+    fast = assess_bluriness_and_corruption_fast(path)
+
+    is_blurry, is_corrupted, blur_score = full[:3]
+    assert not is_corrupted and not fast[1]
+    assert fast[0] == is_blurry
+    assert fast[2] == pytest.approx(blur_score, rel=0.01)
+    # Width and height are the original ones, color and luminance are preserved
+    assert fast[3:5] == full[3:5]
+    np.testing.assert_allclose(fast[6], full[6], rtol=0.02)
+    assert fast[7] == pytest.approx(full[7], rel=0.02)
@@ -0,0 +1,50 @@
+from unittest import mock
+
+import pytest
+
+from agents.common.picsellia import list_assets
+from agents.common.picsellia.list_assets import iter_asset_batches
+
+ASSET_IDS = [f"asset-{i}" for i in range(20)]
+
+
+@pytest.fixture
+def listing() -> mock.Mock:
+    def list_paginated_ids(dataset_version, offset: int, limit: int):
+        return ASSET_IDS[offset : offset + limit], len(ASSET_IDS)
+
+    with (
+        mock.patch.object(list_assets, "_ensure_connection_pool"),
+        mock.patch.object(
+            list_assets, "list_paginated_ids", side_effect=list_paginated_ids
+        ) as list_ids,
+        mock.patch.object(
+            list_assets,
+            "list_preview_assets_from_ids",
+            side_effect=lambda dataset_version, ids: list(ids),
+        ),
+    ):
+        yield list_ids
+
+
+@pytest.mark.parametrize("max_workers", [1, 4])
+def test_iter_asset_batches_keeps_the_order(
+    listing: mock.Mock, max_workers: int
+) -> None:
+    batches = list(
+        iter_asset_batches(
+            mock.Mock(), max_workers=max_workers, page_size=4, batch_size=3
+        )
+    )
+
+    assert [asset for batch in batches for asset in batch] == ASSET_IDS
+    assert max(len(batch) for batch in batches) == 3
+
+
+def test_iter_asset_batches_lists_pages_lazily(listing: mock.Mock) -> None:
+    batches = iter_asset_batches(mock.Mock(), max_workers=1, page_size=2, batch_size=1)
+
+    assert next(batches) == ASSET_IDS[:1]
+    # The first page and at most one page ahead
+    assert listing.call_count <= 2
+    batches.close()
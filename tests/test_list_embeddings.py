@@ -0,0 +1,61 @@
+import uuid
+from unittest import mock
+
+from picsellia.sdk.connexion import Connexion
+from picsellia.services.visual_search import (
+    DatasetVersionVisualSearchService,
+    RectangleVisualSearchService,
+)
+
+from agents.common.picsellia.list_embeddings import (
+    iter_embedding_pages,
+    list_embeddings_page,
+)
+
+
+def mock_connexion(pages: list[dict]) -> mock.Mock:
+    connexion = mock.Mock(spec=Connexion)
+    connexion.get.return_value.json.side_effect = pages
+    return connexion
+
+
+def test_list_embeddings_page() -> None:
+    dataset_version_id = uuid.uuid4()
+    connexion = mock_connexion([{"points": [{"id": "a"}], "next_page_offset": "b"}])
+    service = RectangleVisualSearchService(connexion, dataset_version_id)
+
+    points, offset = list_embeddings_page(service, None, page_size=10)
+
+    assert points == [{"id": "a"}]
+    assert offset == "b"
+    connexion.get.assert_called_once_with(
+        f"/api/dataset/version/{dataset_version_id}/embeddings/shapes",
+        params={
+            "with_vector": True,
+            "with_payload": False,
+            "has_error": False,
+            "limit": 10,
+            "offset": None,
+            "shape_type": "rectangle",
+        },
+    )
+
+
+def test_iter_embedding_pages() -> None:
+    connexion = mock_connexion(
+        [
+            {"points": [{"id": "a"}, {"id": "b"}], "next_page_offset": "c"},
+            {"points": [{"id": "c"}], "next_page_offset": None},
+        ]
+    )
+    service = DatasetVersionVisualSearchService(connexion, uuid.uuid4())
+
+    pages = list(iter_embedding_pages(service, page_size=2))
+
+    assert pages == [[{"id": "a"}, {"id": "b"}], [{"id": "c"}]]
+    assert [
+        call.kwargs["params"]["offset"] for call in connexion.get.call_args_list
+    ] == [
+        None,
+        "c",
+    ]
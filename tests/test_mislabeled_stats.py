@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+from sklearn.metrics.pairwise import cosine_similarity
+
+from agents.annotation_agent.analysis.mislabeled.stats import ShapeMislabeledStats
+
+
+def evaluate_label_quality(
+    stats: ShapeMislabeledStats,
+    shape_embedding: np.ndarray,
+    annotated_label: str,
+    label_embeddings: dict[str, np.ndarray],
+    min_confidence: float = 0.5,
+    rank_tolerance: int = 1,
+) -> str:
+    """Per-shape rules that `_evaluate_labels_quality` vectorizes."""
+    label_names = list(label_embeddings)
+    label_vecs = np.array([label_embeddings[label] for label in label_names])
+    similarities = cosine_similarity(shape_embedding.reshape(1, -1), label_vecs)[0]
+    sorted_labels = [(label_names[i], similarities[i]) for i in similarities.argsort()]
+    sorted_labels.reverse()
+    top_n = stats._determine_top_n(len(label_names))
+    top_sim = sorted_labels[0][1]
+
+    if annotated_label not in label_names:
+        return "wrong"
+    rank = [label for label, _ in sorted_labels].index(annotated_label)
+    annotated_sim = similarities[label_names.index(annotated_label)]
+    if rank == 0:
+        return "correct"
+
+    if len(label_names) < 10:
+        if (
+            rank > rank_tolerance
+            or annotated_sim < min_confidence
+            or top_sim - annotated_sim > stats.threshold / 2
+        ):
+            return "wrong"
+        return "correct"
+
+    if rank >= top_n:
+        if top_sim >= min_confidence and top_sim - annotated_sim > stats.threshold:
+            return "wrong"
+        return "ambiguous"
+    top_sims = [sim for _, sim in sorted_labels[:top_n]]
+    if max(top_sims) - min(top_sims) < stats.threshold:
+        return "ambiguous"
+    return "correct"
+
+
+@pytest.mark.parametrize("num_labels", [5, 40])
+@pytest.mark.parametrize("threshold", [0.01, 0.2])
+def test_evaluate_labels_quality_matches_per_shape_rules(
+    num_labels: int, threshold: float
+) -> None:
+    rng = np.random.default_rng(num_labels)
+    label_names = [f"label_{i}" for i in range(num_labels)]
+    label_embeddings = dict(
+        zip(label_names, rng.normal(size=(num_labels, 8)), strict=True)
+    )
+    # Shapes close to a random label, annotated with a random label or an unknown one
+    closest = rng.integers(0, num_labels, size=500)
+    shape_embeddings = np.array(
+        [label_embeddings[label_names[i]] for i in closest]
+    ) + rng.normal(scale=0.8, size=(500, 8))
+    annotated_labels = [
+        label_names[i] if rng.random() < 0.5 else label_names[rng.integers(num_labels)]
+        for i in closest
+    ]
+    annotated_labels[:5] = ["unknown"] * 5
+
+    stats = ShapeMislabeledStats.__new__(ShapeMislabeledStats)
+    stats.threshold = threshold
+    stats.clip_embedded_labels = label_embeddings
+    stats.SIMILARITY_CHUNK_SIZE = 64
+
+    ambiguous, wrong, top_labels = stats._evaluate_labels_quality(
+        shape_embeddings, annotated_labels, label_names
+    )
+
+    expected = [
+        evaluate_label_quality(stats, embedding, label, label_embeddings)
+        for embedding, label in zip(shape_embeddings, annotated_labels, strict=True)
+    ]
+    assert wrong.tolist() == [status == "wrong" for status in expected]
+    assert ambiguous.tolist() == [status == "ambiguous" for status in expected]
+    similarities = cosine_similarity(shape_embeddings, list(label_embeddings.values()))
+    assert top_labels.tolist() == similarities.argmax(axis=1).tolist()
+    assert {"wrong", "correct"} <= set(expected)